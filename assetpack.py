@@ -0,0 +1,154 @@
+"""All of the game's assets in one file that loads without decoding.
+
+The pack is built once, for example before freezing the game with setup.py.
+Images are stored as raw BGRA pixels, the byte order of a 32 bit display
+surface, so pygame.image.frombuffer can use them straight from the mapped
+file. Sounds are stored as the PCM of the mixer format they were decoded
+for, next to their original .wav file. Fonts are stored as they are. The
+PCM is used if the mixer opened with the format it was decoded for, like
+on most devices; otherwise the sound is decoded from the packed .wav, since
+a frozen build has no loose files. Everything the pack does not hold is
+loaded from its loose file as in development.
+
+    header    b"FBAP", version (u8), index length (u32)
+    index     JSON: name -> kind, offset and length of the data, and
+              the image size or the sound format and the offset and
+              length of the sound's file
+    data      the entries, each starting on a 16 byte boundary
+
+    python assetpack.py assets.pack     build a pack from the loose files
+"""
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+import time
+
+import pygame
+
+from audio import EFFECTS
+
+MAGIC = b"FBAP"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sBI")
+_ALIGN = 16
+
+# What goes into a pack
+IMAGES = ("background.jpg", "bird.png", "downpipe.png", "uppipe.png", "ground.png")
+SOUNDS = tuple(f"{effect}.wav" for effect in EFFECTS)
+FILES = ("score_font.ttf",)
+
+def build(path, settings=None):
+    """Decode every asset and write them all to a pack at path."""
+    from settings import Settings
+
+    settings = settings if settings is not None else Settings()
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.mixer.init(frequency=settings.sound_frequency, size=-16, channels=2)
+    frequency, size, channels = pygame.mixer.get_init()
+
+    index = {}
+    blobs = []
+    offset = 0
+
+    def put(data):
+        """Add data to the blobs and return its offset."""
+        nonlocal offset
+        start = offset
+        padding = -len(data) % _ALIGN
+        blobs.append(data + b"\0" * padding)
+        offset += len(data) + padding
+        return start
+
+    def add(name, data, **entry):
+        index[name] = dict(entry, offset=put(data), length=len(data))
+
+    for name in IMAGES:
+        image = pygame.image.load(name)
+        add(name, pygame.image.tobytes(image, "BGRA"), kind="image", size=image.get_size())
+    for name in SOUNDS:
+        with open(name, "rb") as infile:
+            data = infile.read()
+        add(name, pygame.mixer.Sound(name).get_raw(), kind="sound", frequency=frequency, format=size, channels=channels,
+            file={"offset": put(data), "length": len(data)})
+    for name in FILES:
+        with open(name, "rb") as infile:
+            add(name, infile.read(), kind="file")
+    pygame.mixer.quit()
+
+    header = json.dumps(index).encode()
+    # Start the data on the alignment too
+    header += b" " * (-(len(header) + _HEADER.size) % _ALIGN)
+    with open(path + ".tmp", "wb") as outfile:
+        outfile.write(_HEADER.pack(MAGIC, VERSION, len(header)))
+        outfile.write(header)
+        for blob in blobs:
+            outfile.write(blob)
+    os.replace(path + ".tmp", path)
+    return index
+
+class AssetPack:
+    """A pack mapped into memory, handing out surfaces, sounds and files without decoding."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as infile:
+            self.map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = _HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a version {VERSION} asset pack")
+        self.index = json.loads(bytes(self.map[_HEADER.size:_HEADER.size + length]))
+        self.data_start = _HEADER.size + length
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def _view(self, entry):
+        start = self.data_start + entry["offset"]
+        return memoryview(self.map)[start:start + entry["length"]]
+
+    def image(self, name):
+        """Return a surface of an image that reads its pixels from the pack; convert it before drawing."""
+        entry = self.index[name]
+        return pygame.image.frombuffer(self._view(entry), entry["size"], "BGRA")
+
+    def sound(self, name):
+        """Return a sound from the pack, decoding its file if the mixer opened with another format."""
+        entry = self.index[name]
+        if pygame.mixer.get_init() != (entry["frequency"], entry["format"], entry["channels"]):
+            return pygame.mixer.Sound(file=io.BytesIO(self._view(entry["file"])))
+        return pygame.mixer.Sound(buffer=self._view(entry))
+
+    def file(self, name):
+        """Return a file's contents as a file object, like for pygame.font.Font."""
+        return io.BytesIO(self._view(self.index[name]))
+
+    def close(self):
+        self.map.close()
+
+def load_image(path, pack=None):
+    """Return an image from the pack if it holds it, decoded from its file otherwise."""
+    return pack.image(path) if pack is not None and path in pack else pygame.image.load(path)
+
+def open_pack(path):
+    """Open the pack at path, or return None if there is none, like while developing."""
+    if path is None or not os.path.exists(path):
+        return None
+    return AssetPack(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the game's assets into one file that loads without decoding.")
+    parser.add_argument("path", nargs="?", default="assets.pack")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build(args.path)
+    print(f"{len(index)} assets, {os.path.getsize(args.path) / 1024:.0f} KiB in {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
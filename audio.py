@@ -0,0 +1,108 @@
+"""Sound effects played on reserved mixer channels.
+
+Every effect is loaded from its uncompressed .wav file of 16 bit PCM at the
+mixer's rate, so loading needs no decoder. Most are stereo like the mixer
+and load as a copy; wing.wav is mono and is widened to stereo as it loads.
+Each effect gets a mixer channel of its own that nothing else can take:
+a flap restarts the flap sound instead of cutting off a point sound. Effects
+asked for during a frame are collected and played once when the frame ends,
+and an effect that played very recently is skipped instead of restarted.
+"""
+import time
+
+import pygame
+from pygame.locals import AUDIO_ALLOW_FREQUENCY_CHANGE, AUDIO_ALLOW_CHANNELS_CHANGE
+
+EFFECTS = ("wing", "point", "hit", "die")
+
+class SoundManager:
+    """Play the game's effects on one reserved channel each."""
+
+    def __init__(self, assets, settings, effects=EFFECTS):
+        """Prepare the manager; open_mixer has to run before anything plays.
+
+        :param assets: the Assets that load and keep the sounds
+        """
+        self.assets = assets
+        self.settings = settings
+        self.effects = list(effects)
+        self.channels = {}
+        self.ready = False
+
+        self.requests = []
+        self.last_played = {effect: float("-inf") for effect in self.effects}
+
+        # What happened to the effects that were asked for
+        self.counts = {"played": 0, "coalesced": 0, "rate limited": 0, "restarted": 0, "not loaded": 0, "late": 0}
+        # Seconds from the first request of an effect in a frame to its play call
+        self.delays = []
+
+    def paths(self):
+        return [f"{effect}.wav" for effect in self.effects]
+
+    def open_mixer(self):
+        """Open the mixer and reserve a channel per effect.
+
+        Meant to run on the assets' background thread before the sounds are
+        loaded; effects asked for before they are ready are counted as not
+        loaded and skipped.
+        """
+        settings = self.settings
+        pygame.mixer.init(frequency=settings.sound_frequency, size=-16, channels=2, buffer=settings.sound_buffer,
+                          devicename=None, allowedchanges=AUDIO_ALLOW_FREQUENCY_CHANGE | AUDIO_ALLOW_CHANNELS_CHANGE)
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), len(self.effects)))
+        pygame.mixer.set_reserved(len(self.effects))
+        self.channels = {effect: pygame.mixer.Channel(index) for index, effect in enumerate(self.effects)}
+        self.ready = True
+
+    def play(self, effect):
+        """Ask for an effect; it is played at the end of the frame."""
+        self.requests.append((effect, time.perf_counter()))
+
+    def update(self):
+        """Play the effects asked for during this frame, each at most once."""
+        if not self.requests:
+            return
+        now = time.perf_counter()
+        latency = self.latency()
+        seen = set()
+        for effect, requested in self.requests:
+            if effect in seen:
+                self.counts["coalesced"] += 1
+                continue
+            seen.add(effect)
+            sound = self.assets.loaded_sound(f"{effect}.wav") if self.ready else None
+            if sound is None:
+                self.counts["not loaded"] += 1
+                continue
+            if now - self.last_played[effect] < self.settings.sound_min_interval:
+                self.counts["rate limited"] += 1
+                continue
+            channel = self.channels[effect]
+            if channel.get_busy():
+                self.counts["restarted"] += 1
+            channel.play(sound)
+            self.last_played[effect] = now
+            self.counts["played"] += 1
+            self.delays.append(now - requested)
+            # pygame cannot see the mixer's own underruns; an effect that waited
+            # longer than one buffer is the nearest thing the game can notice
+            if now - requested > latency:
+                self.counts["late"] += 1
+        self.requests.clear()
+        # Keep only recent delays, the report is about how the mixer is doing now
+        del self.delays[:-256]
+
+    def latency(self):
+        """Return the delay the mixer's buffer adds, in seconds, or None before it is open."""
+        init = pygame.mixer.get_init() if self.ready else None
+        if not init:
+            return None
+        return self.settings.sound_buffer / init[0]
+
+    def report(self):
+        latency = self.latency()
+        delay = max(self.delays, default=0.0)
+        return ("sound " + ("mixer not open" if latency is None else f"buffer {latency * 1000:.1f} ms")
+                + f", worst queue delay {delay * 1000:.2f} ms, "
+                + ", ".join(f"{count} {name}" for name, count in self.counts.items()))
@@ -0,0 +1,300 @@
+"""Many independent games of Flappy Bird advanced together with NumPy.
+
+BatchEngine keeps every bird and pipe of N games in arrays and runs the same
+arithmetic as engine.BirdBody and engine.Engine on all of them at once. Each
+game draws its pipe heights from its own random.Random, so game i of a batch
+seeded with seeds[i] plays out exactly like Engine(seed=seeds[i]) given the
+same flaps and time step.
+
+The bird half lives in BirdBatch, which population.Population shares to fly
+many birds through a single course.
+"""
+import random
+
+import numpy as np
+
+from engine import READY, ACTIVE, OVER, game_seed, load_schedule
+from settings import Settings
+
+def to_pixels(values):
+    """Round positions the way pygame.Rect does, like engine.to_pixel."""
+    magnitude = np.abs(values)
+    pixels = np.floor(magnitude)
+    pixels += (magnitude - pixels) >= 0.5
+    return np.where(values >= 0, pixels, -pixels).astype(np.int64)
+
+class BirdBatch:
+    """The statuses and birds of N games in arrays, with vector versions of BirdBody's methods."""
+
+    def __init__(self, n, settings=None):
+        self.n = n
+        self.settings = settings if settings is not None else Settings()
+        if self.settings.collision_mode != "rect":
+            raise ValueError(f"{type(self).__name__} only tests rect collisions, use Engine for collision_mode "
+                             f"{self.settings.collision_mode!r}")
+
+        # Game statuses and statistics
+        self.status = np.full(n, READY, dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.active_time = np.zeros(n)
+        self.frame = np.zeros(n, dtype=np.int64)
+
+        # Birds
+        self.bird_left = self.settings.screen_width // 2 // 2 - self.settings.bird_width // 2
+        self.bird_start_top = self.settings.screen_height // 2 - self.settings.bird_height // 2
+        self.bird_top = np.zeros(n, dtype=np.int64)
+        self.bird_y = np.zeros(n)
+        self.isjump = np.zeros(n, dtype=bool)
+        self.velocity = np.zeros(n)
+        self.jumping_velocity = np.zeros(n)
+        self.jumping_height = np.zeros(n)
+        self.rotation_angle = np.zeros(n)
+        self.previous_rotation_angle = np.zeros(n)
+
+        # What happened to each game during the last step
+        self.points = np.zeros(n, dtype=np.int64)
+        self.hits = np.zeros(n, dtype=bool)
+        self.flaps = np.zeros(n, dtype=bool)
+        self.resets = np.zeros(n, dtype=bool)
+
+    def _reset_birds(self, indices):
+        """Put the birds of some games back at the start, READY to fly."""
+        self.status[indices] = READY
+        self.score[indices] = 0
+        self.active_time[indices] = 0
+        self.frame[indices] = 0
+
+        self.bird_top[indices] = self.bird_start_top
+        self.bird_y[indices] = self.bird_start_top
+        self.isjump[indices] = False
+        self.velocity[indices] = self.settings.bird_initial_velocity
+        self.jumping_velocity[indices] = self.settings.bird_initial_jumping_velocity
+        self.jumping_height[indices] = 0
+        self.rotation_angle[indices] = 0
+        self.previous_rotation_angle[indices] = 0
+        self.resets[indices] = True
+
+    def _jump(self, mask):
+        s = self.settings
+        self.flaps |= mask
+        self.isjump[mask] = True
+        self.velocity[mask] = s.bird_initial_velocity
+        self.jumping_velocity[mask] = s.bird_initial_jumping_velocity
+        self.previous_rotation_angle[mask] = -self.rotation_angle[mask]
+        reset_height = mask & ((self.jumping_height < 0) | (self.jumping_height > s.bird_max_jumping_height))
+        self.jumping_height[reset_height] = 0
+
+    def _update_birds(self, mask, dt):
+        """Vector version of BirdBody.update."""
+        s = self.settings
+        jumping = mask & self.isjump
+        falling = mask & ~self.isjump
+
+        distance_moved = dt * self.jumping_velocity[jumping]
+        self.bird_y[jumping] -= distance_moved
+        self.jumping_height[jumping] += distance_moved
+
+        rising = jumping & (self.rotation_angle < s.bird_rise_angle)
+        self.rotation_angle[rising] = self.jumping_height[rising] / s.bird_max_jumping_height * (s.bird_rise_angle + self.previous_rotation_angle[rising]) - self.previous_rotation_angle[rising]
+        self.jumping_velocity[jumping] -= dt * s.bird_gravity
+
+        # Jumps that ran out of speed end without moving the bird's rect
+        ended = jumping & (self.jumping_velocity <= 0)
+        self.isjump[ended] = False
+        self.velocity[ended] = s.bird_initial_velocity
+        self.jumping_velocity[ended] = s.bird_initial_jumping_velocity
+        self.jumping_height[ended] = 0
+        self.previous_rotation_angle[ended] = np.abs(self.rotation_angle[ended])
+
+        moved = jumping & ~ended
+        self.bird_top[moved] = to_pixels(self.bird_y[moved])
+
+        self._fall(falling, dt)
+
+    def _fall(self, mask, dt):
+        """Vector version of BirdBody.fall."""
+        s = self.settings
+        distance_moved = dt * self.velocity
+
+        lowering = mask & (self.jumping_height >= s.bird_max_falling_height)
+        self.jumping_height[lowering] -= distance_moved[lowering]
+        turning = mask & (self.rotation_angle > s.bird_fall_angle)
+        self.rotation_angle[turning] = self.jumping_height[turning] / s.bird_max_falling_height * (s.bird_fall_angle - self.previous_rotation_angle[turning]) + self.previous_rotation_angle[turning]
+
+        self.bird_y[mask] += distance_moved[mask]
+        speeding = mask & (self.velocity < s.bird_max_velocity)
+        self.velocity[speeding] += dt * s.bird_gravity
+
+        self.bird_top[mask] = to_pixels(self.bird_y[mask])
+
+    def _lose_fall(self, mask, dt):
+        self._fall(mask & (self.bird_top + self.settings.bird_height < self.settings.ground_height), dt)
+
+    def _stop(self, mask):
+        """Vector version of BirdBody.stop."""
+        s = self.settings
+        self.isjump[mask] = False
+        self.velocity[mask] = s.bird_initial_velocity
+        self.jumping_velocity[mask] = s.bird_initial_jumping_velocity
+        self.jumping_height[mask] = 0
+        self.previous_rotation_angle[mask] = np.abs(self.rotation_angle[mask])
+
+    def _check_ground(self, mask):
+        s = self.settings
+        bottom = self.bird_top + s.bird_height
+        hit = mask & (self.status == ACTIVE) & (bottom > s.ground_height) & (self.bird_top < s.ground_height + s.ground_tile_height)
+        self.status[hit] = OVER
+        self.hits |= hit
+
+class BatchEngine(BirdBatch):
+    """N games of Flappy Bird stepped in lockstep."""
+
+    def __init__(self, n, settings=None, seeds=None, pipe_slots=4, schedule=None):
+        """Create n games.
+
+        :param seeds: one seed per game, or a single int that game i adds i to
+        :param pipe_slots: pipe pairs stored per game before the arrays grow
+        :param schedule: pipe schedule every game plays, see Engine
+        """
+        super().__init__(n, settings)
+        if seeds is None or isinstance(seeds, int):
+            seeds = [None if seeds is None else seeds + index for index in range(n)]
+        self.seeds = [game_seed(seed) for seed in seeds]
+        self.randoms = [random.Random(seed) for seed in self.seeds]
+        self.schedule = schedule if schedule is not None else load_schedule(self.settings)
+
+        # Pipe pairs, one column per slot. newest holds the slot of the pair
+        # that was spawned last, which the engine calls the latest pipe.
+        self.pipe_alive = np.zeros((n, pipe_slots), dtype=bool)
+        self.pipe_x = np.zeros((n, pipe_slots))
+        self.pipe_left = np.zeros((n, pipe_slots), dtype=np.int64)
+        self.pipe_top = np.zeros((n, pipe_slots), dtype=np.int64)
+        self.pipe_bottom = np.zeros((n, pipe_slots), dtype=np.int64)
+        self.pipe_latest = np.zeros((n, pipe_slots), dtype=bool)
+        self.pipe_scored = np.zeros((n, pipe_slots), dtype=bool)
+        self.newest = np.zeros(n, dtype=np.int64)
+        # Speed of each game's pairs, and with a schedule the index of its next pair
+        self.pipe_speed = np.full(n, float(self.settings.pipe_speed))
+        self.course = np.zeros(n, dtype=np.int64)
+
+        self.reset()
+
+    def reset(self, indices=None, seeds=None):
+        """Start new games, reseeding their pipe heights if seeds are given.
+
+        :param indices: the games to reset, all of them by default
+        """
+        indices = np.arange(self.n) if indices is None else np.asarray(indices, dtype=np.int64).reshape(-1)
+        if seeds is not None:
+            for index, seed in zip(indices, np.broadcast_to(seeds, indices.shape)):
+                seed = game_seed(seed)
+                self.seeds[index] = seed
+                self.randoms[index].seed(seed)
+
+        self._reset_birds(indices)
+        self.pipe_speed[indices] = self.settings.pipe_speed
+        self.course[indices] = 0
+        self.pipe_alive[indices] = False
+        for index in indices:
+            self._create_pipe_pair(index)
+
+    def step(self, actions=None, dt=None):
+        """Apply the flaps in actions, then advance every game by dt seconds.
+
+        Returns the points each game scored and whether it crashed this step.
+        """
+        self.points[:] = 0
+        self.hits[:] = False
+        self.flaps[:] = False
+        self.resets[:] = False
+        if actions is not None:
+            self.flap(np.asarray(actions, dtype=bool))
+        self.advance(self.settings.time_step if dt is None else dt)
+        return self.points, self.hits
+
+    def flap(self, actions):
+        """React to the jump key in the games where actions is true."""
+        restart = actions & (self.status == OVER)
+        self._jump(actions & (self.status == ACTIVE))
+        start = actions & (self.status == READY)
+        self.status[start] = ACTIVE
+        self._jump(start)
+        if restart.any():
+            self.reset(np.flatnonzero(restart))
+
+    def advance(self, dt):
+        """Move every game by dt seconds without any input."""
+        active = self.status == ACTIVE
+        over = self.status == OVER
+
+        self.active_time[active] += dt
+        self._update_birds(active, dt)
+        self._update_pipes(active & (self.active_time >= self.settings.pipe_start_time), dt)
+        self._check_ground(active)
+        self._lose_fall(over, dt)
+        self.frame += 1
+
+    def _update_pipes(self, mask, dt):
+        s = self.settings
+        moving = self.pipe_alive & mask[:, None]
+        self.pipe_x[moving] -= np.broadcast_to((dt * self.pipe_speed)[:, None], moving.shape)[moving]
+        self.pipe_left[moving] = to_pixels(self.pipe_x[moving])
+        self.pipe_alive &= ~(moving & (self.pipe_x <= -s.pipe_width))
+
+        rows = np.arange(self.n)
+        if self.schedule is None:
+            distance = s.pipe_distance
+        else:
+            distance = self.schedule["distance"][self.course % len(self.schedule)]
+        spawn = mask & (self.pipe_left[rows, self.newest] <= distance) & self.pipe_latest[rows, self.newest]
+        for index in np.flatnonzero(spawn):
+            self.pipe_latest[index, self.newest[index]] = False
+            self._create_pipe_pair(index)
+
+        # Check bird and pipes collisions with array AABB tests
+        bird_top = self.bird_top[:, None]
+        bird_bottom = bird_top + s.bird_height
+        overlap_x = (self.bird_left < self.pipe_left + s.pipe_width) & (self.pipe_left < self.bird_left + s.bird_width)
+        hit_down = (bird_top < self.pipe_top) & (self.pipe_top - s.pipe_height < bird_bottom)
+        hit_up = (bird_top < self.pipe_bottom + s.pipe_height) & (self.pipe_bottom < bird_bottom)
+        hit = mask & (self.pipe_alive & overlap_x & (hit_down | hit_up)).any(axis=1)
+        self.status[hit] = OVER
+        self.hits |= hit
+        self._stop(hit)
+
+        # Check if bird crossed the pipe
+        crossed = (mask & ~hit)[:, None] & self.pipe_alive & ~self.pipe_scored & (self.pipe_left <= self.bird_left)
+        self.pipe_scored |= crossed
+        points = crossed.sum(axis=1)
+        self.score += points
+        self.points += points
+
+    def _create_pipe_pair(self, index):
+        """Spawn a pair in a free slot of one game, growing the slots if needed."""
+        free = np.flatnonzero(~self.pipe_alive[index])
+        if free.size == 0:
+            self._grow_pipe_slots()
+            free = np.flatnonzero(~self.pipe_alive[index])
+        slot = free[0]
+
+        s = self.settings
+        self.pipe_alive[index, slot] = True
+        self.pipe_x[index, slot] = float(s.screen_width)
+        self.pipe_left[index, slot] = s.screen_width
+        if self.schedule is None:
+            self.pipe_top[index, slot] = self.randoms[index].randint(s.pipe_min_top, s.pipe_max_top)
+            self.pipe_bottom[index, slot] = self.pipe_top[index, slot] + s.pipe_space
+        else:
+            entry = self.schedule[self.course[index] % len(self.schedule)]
+            self.course[index] += 1
+            self.pipe_top[index, slot] = entry["top"]
+            self.pipe_bottom[index, slot] = entry["top"] + entry["space"]
+            self.pipe_speed[index] = entry["speed"]
+        self.pipe_latest[index, slot] = True
+        self.pipe_scored[index, slot] = False
+        self.newest[index] = slot
+
+    def _grow_pipe_slots(self):
+        for name in ("pipe_alive", "pipe_x", "pipe_left", "pipe_top", "pipe_bottom", "pipe_latest", "pipe_scored"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)], axis=1))
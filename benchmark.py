@@ -0,0 +1,199 @@
+"""Reproducible benchmarks for the simulation and the renderer.
+
+Every scenario plays a fixed, seeded game with scripted input and runs in a
+fresh process under SDL's dummy video and audio drivers, so the numbers do
+not depend on a window or on what ran before, and each scenario's peak
+memory is its own.
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json     flag regressions against a stored run
+
+Scenarios:
+    engine         Engine steps per second with the hover policy
+    batch_engine   BatchEngine bird steps per second for 1024 games
+    render_full    frames per second of _update_frame and _update_screen, full redraws
+    render_dirty   the same with the dirty-rect renderer
+    startup        seconds from importing flappy_bird to the first drawn frame
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# The direction that counts as better for each metric
+HIGHER_IS_BETTER = {"steps_per_second": True, "frames_per_second": True, "seconds": False, "peak_rss_mb": False}
+
+SEED = 0
+
+def bench_engine(steps=200000):
+    from engine import Engine, OVER
+    from rollout import hover_policy
+
+    engine = Engine(seed=SEED)
+    score = 0
+    start = time.perf_counter()
+    for step in range(steps):
+        if engine.stats.game_status == OVER:
+            score += engine.stats.score
+            engine.reset()
+        engine.step(hover_policy(engine))
+    elapsed = time.perf_counter() - start
+    return {"steps_per_second": steps / elapsed, "score": score + engine.stats.score}
+
+def bench_batch_engine(games=1024, steps=1000):
+    import numpy as np
+    from batch_engine import BatchEngine
+
+    batch = BatchEngine(games, seeds=SEED)
+    actions = np.random.default_rng(SEED).random((steps, games)) < 0.07
+    start = time.perf_counter()
+    for step in range(steps):
+        batch.step(actions[step])
+    elapsed = time.perf_counter() - start
+    return {"steps_per_second": games * steps / elapsed, "score": int(batch.score.sum())}
+
+def _scratch_settings():
+    """Settings with score files of their own, so benchmarks never touch the player's."""
+    from settings import Settings
+
+    directory = tempfile.mkdtemp()
+    return Settings().override(highscore_path=os.path.join(directory, "highscore.txt"),
+                               stats_path=os.path.join(directory, "stats.bin"))
+
+def _bench_render(mode, frames=2000):
+    import flappy_bird
+    from rollout import hover_policy
+
+    fb_game = flappy_bird.FlappyBird(_scratch_settings())
+    fb_game.settings.render_mode = mode
+    fb_game.engine.reset(SEED)
+    start = time.perf_counter()
+    for frame in range(frames):
+        fb_game.settings.time_passed_seconds = fb_game.settings.time_step
+        fb_game.flap_requested = hover_policy(fb_game.engine) or fb_game.stats.game_status != flappy_bird.ACTIVE
+        fb_game._update_frame()
+        fb_game._update_screen()
+    elapsed = time.perf_counter() - start
+    return {"frames_per_second": frames / elapsed, "score": fb_game.stats.score}
+
+def bench_render_full():
+    return _bench_render("full")
+
+def bench_render_dirty():
+    return _bench_render("dirty")
+
+def bench_startup():
+    start = time.perf_counter()
+    import flappy_bird
+    fb_game = flappy_bird.FlappyBird(_scratch_settings())
+    fb_game._update_frame()
+    fb_game._update_screen()
+    return {"seconds": time.perf_counter() - start}
+
+SCENARIOS = {
+    "engine": bench_engine,
+    "batch_engine": bench_batch_engine,
+    "render_full": bench_render_full,
+    "render_dirty": bench_render_dirty,
+    "startup": bench_startup,
+}
+
+def peak_rss_mb():
+    """Peak resident memory of this process, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def run_scenario(name):
+    """Run one scenario in this process and print its result as JSON."""
+    result = SCENARIOS[name]()
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+def run_isolated(name):
+    """Run one scenario in a fresh process and return its result."""
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--scenario", name],
+                            cwd=here, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def best_of(results):
+    """Combine repeated runs of a scenario, keeping the best value of each metric."""
+    best = dict(results[0])
+    for result in results[1:]:
+        for metric, value in result.items():
+            if metric not in HIGHER_IS_BETTER or value is None:
+                continue
+            better = max if HIGHER_IS_BETTER[metric] else min
+            best[metric] = better(best[metric], value)
+    return best
+
+def compare(results, baseline, threshold):
+    """Return a line for every metric that got worse than the baseline by more than threshold."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric, value in result.items():
+            old = baseline[name].get(metric)
+            if old is None or value is None:
+                continue
+            if metric == "score":
+                if value != old:
+                    regressions.append(f"{name}: score {old} -> {value}, the scripted game played out differently")
+                continue
+            change = (value - old) / old if old else 0.0
+            worse = -change if HIGHER_IS_BETTER[metric] else change
+            if worse > threshold:
+                regressions.append(f"{name}: {metric} {old:.4g} -> {value:.4g} ({worse:.1%} worse)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Flappy Bird simulation and renderer.")
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--only", action="append", choices=SCENARIOS, help="run only these scenarios")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario, the best one counts")
+    parser.add_argument("--output", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against results written earlier")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before a metric is flagged")
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(args.scenario)
+        return
+
+    results = {}
+    for name in args.only or SCENARIOS:
+        results[name] = best_of([run_isolated(name) for run in range(args.repeat)])
+        print(f"{name}: " + ", ".join(f"{metric} {value:.4g}" if isinstance(value, float) else f"{metric} {value}"
+                                      for metric, value in results[name].items()))
+
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(),
+                       "results": results}, outfile, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Frame capture to PNG sequences and raw video streams.
+
+A FrameCapture takes the screen after every drawn frame. The pixels are
+read through a view of the surface's own memory and copied once, row by
+row, into one of a few preallocated buffers; encoding and writing happen
+on background threads. When all buffers are waiting to be written, the
+next capture waits for one, so memory stays bounded however long the run.
+
+The output is either a directory of numbered PNG files, compressed with
+zlib on the writer threads, or a single file of raw RGB24 frames that
+ffmpeg can encode:
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 1000x680 -r 60 -i attract.rgb attract.mp4
+
+Runs are rendered without a window and as fast as they draw, so a replay
+or a scripted game exports much faster than real time:
+
+    python capture.py frames/ --replay game.fbr              every frame of a replay as PNGs
+    python capture.py attract.rgb --seed 3 --frames 3600     a minute of the hover policy as raw video
+    python capture.py shots/ --seed 3 --every 600            a regression screenshot every 600 frames
+"""
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def write_png(path, rows, width, height, level=1):
+    """Write RGB24 rows that each start with a filter byte as a PNG file."""
+    with open(path, "wb") as outfile:
+        outfile.write(PNG_SIGNATURE)
+        outfile.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        outfile.write(_png_chunk(b"IDAT", zlib.compress(rows, level)))
+        outfile.write(_png_chunk(b"IEND", b""))
+
+class FrameCapture:
+    """Copies frames of a surface into a pool of buffers that writer threads drain."""
+
+    def __init__(self, path, size, buffers=8, threads=1, png_level=1):
+        """Start the writer threads.
+
+        :param path: directory for a PNG sequence, or a file ending in .rgb for raw frames
+        :param size: width and height of the captured surface
+        :param buffers: frames that can wait to be written
+        :param threads: writer threads; a raw stream always uses one to keep the frames in order
+        """
+        self.path = path
+        self.width, self.height = size
+        self.raw = path.endswith(".rgb")
+        self.png_level = png_level
+        if self.raw:
+            self.outfile = open(path, "wb")
+            threads = 1
+            shape = (self.height, self.width * 3)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.outfile = None
+            # Every PNG row starts with its filter byte, 0 for none
+            shape = (self.height, 1 + self.width * 3)
+
+        self.free = queue.Queue()
+        for buffer in range(buffers):
+            self.free.put(np.zeros(shape, dtype=np.uint8))
+        self.full = queue.Queue()
+
+        # Frames taken and written, and seconds spent waiting for a free buffer
+        self.frames = 0
+        self.written = 0
+        self.wait_seconds = 0.0
+        self.copy_seconds = 0.0
+        self.lock = threading.Lock()
+
+        self.threads = [threading.Thread(target=self._write, name=f"FrameCapture.write{index}", daemon=True)
+                        for index in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def frame(self, surface):
+        """Copy the surface into a free buffer and queue it to be written."""
+        start = time.perf_counter()
+        buffer = self.free.get()
+        copying = time.perf_counter()
+        self.wait_seconds += copying - start
+
+        # The surface's pixels in memory order, rows of pitch bytes
+        memory = surface.get_buffer()
+        bytesize = surface.get_bytesize()
+        pixels = np.frombuffer(memory, dtype=np.uint8).reshape(self.height, surface.get_pitch())
+        pixels = pixels[:, :self.width * bytesize].reshape(self.height, self.width, bytesize)
+        target = buffer[:, -self.width * 3:].reshape(self.height, self.width, 3)
+        # On a little endian machine a channel's shift tells its byte
+        for channel, shift in enumerate(surface.get_shifts()[:3]):
+            target[..., channel] = pixels[..., shift // 8]
+        # The surface stays locked while a view of its memory exists
+        del pixels, memory
+
+        self.full.put((self.frames, buffer))
+        self.frames += 1
+        self.copy_seconds += time.perf_counter() - copying
+
+    def _write(self):
+        while True:
+            item = self.full.get()
+            if item is None:
+                break
+            index, buffer = item
+            if self.raw:
+                self.outfile.write(buffer)
+            else:
+                write_png(os.path.join(self.path, f"{index:06d}.png"), buffer, self.width, self.height, self.png_level)
+            with self.lock:
+                self.written += 1
+            self.free.put(buffer)
+
+    def close(self):
+        """Write the frames that are still waiting and stop the threads."""
+        for thread in self.threads:
+            self.full.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.outfile:
+            self.outfile.close()
+
+    def report(self):
+        frames = max(self.frames, 1)
+        return (f"capture {self.frames} frames, {self.written} written, "
+                f"copy {self.copy_seconds / frames * 1000:.2f} ms/frame, "
+                f"waited for the writer {self.wait_seconds:.2f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a replay or a scripted game without a window and save its frames.")
+    parser.add_argument("path", help="directory for PNG files, or a file ending in .rgb for raw RGB24 frames")
+    parser.add_argument("--replay", metavar="PATH", help="render a replay file")
+    parser.add_argument("--seed", type=int, default=0, help="seed of a scripted game played by the hover policy")
+    parser.add_argument("--frames", type=int, default=600, help="frames of a scripted game")
+    parser.add_argument("--every", type=int, default=1, help="keep every n-th frame")
+    parser.add_argument("--threads", type=int, default=None, help="PNG writer threads, one per core by default")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import flappy_bird
+    from replay import ReplayReader
+    from rollout import hover_policy
+    from settings import Settings
+
+    if args.replay:
+        reader = ReplayReader(args.replay)
+        settings = reader.settings
+    else:
+        reader = None
+        settings = Settings()
+    # Rendering a game must not count it as played; set directly, since
+    # override would recompute the settings the replay recorded
+    settings.highscore_path = None
+    settings.stats_path = None
+    fb_game = flappy_bird.FlappyBird(settings)
+    if reader:
+        fb_game.replay(reader)
+    else:
+        fb_game.engine.reset(args.seed)
+
+    capture = FrameCapture(args.path, fb_game.screen.get_size(), settings.capture_buffers,
+                           args.threads or os.cpu_count(), settings.capture_png_level)
+    start = time.perf_counter()
+    frame = 0
+    game_seconds = 0.0
+    while reader and fb_game.player or not reader and frame < args.frames:
+        if not reader:
+            fb_game.settings.time_passed_seconds = fb_game.settings.time_step
+            fb_game.flap_requested = hover_policy(fb_game.engine) or fb_game.stats.game_status != flappy_bird.ACTIVE
+        if not fb_game._update_frame():
+            # The replay ran out; every recorded frame has been captured
+            break
+        game_seconds += fb_game.settings.time_passed_seconds
+        fb_game._update_screen()
+        if frame % args.every == 0:
+            capture.frame(fb_game.screen)
+        frame += 1
+    capture.close()
+    elapsed = time.perf_counter() - start
+    print(f"{frame} frames in {elapsed:.2f} s, {game_seconds / elapsed:.1f}x real time")
+    print(capture.report())
+    if capture.raw:
+        print(f"ffmpeg -f rawvideo -pix_fmt rgb24 -s {capture.width}x{capture.height} "
+              f"-r {round(1 / settings.time_step / args.every)} -i {args.path} {os.path.splitext(args.path)[0]}.mp4")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Keyboard input stamped with the time it arrived, and its latency to the screen.
+
+pygame's event queue is restricted to the event types the game reacts to,
+so the window system's other events are dropped before they are queued.
+The Pacer polls the queue every input_poll_interval while it waits for the
+next frame, not only once per frame. An event is stamped halfway between
+the poll that found it and the one before, so each key press is stamped
+within half a poll interval of when it happened. FlappyBird uses the
+stamp to flap at that moment within the engine step, so a flap does not
+depend on where in a frame the key went down.
+
+For every flap the time from its key press until the display update of
+the frame that first showed it is kept; that is input to photon latency
+minus the monitor's own delay, which the game cannot see.
+"""
+import statistics
+import time
+from collections import deque
+
+import pygame
+from pygame.locals import QUIT, KEYDOWN
+
+ALLOWED_EVENTS = (QUIT, KEYDOWN)
+
+class InputQueue:
+    """Timestamped events of the allowed types, and the latency of the flaps they caused."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(ALLOWED_EVENTS)
+        self.events = []
+        self.last_poll = time.perf_counter()
+
+        # Key press times of flaps that are not on the screen yet, and the
+        # latencies of the ones that are
+        self.pending = []
+        self.latencies = deque(maxlen=settings.input_latency_samples)
+
+    def poll(self):
+        """Move pygame's queued events into this queue, stamped with the time they arrived."""
+        events = pygame.event.get()
+        now = time.perf_counter()
+        if events:
+            # They arrived some time since the last poll
+            arrived = (self.last_poll + now) / 2
+            self.events.extend((arrived, event) for event in events)
+        self.last_poll = now
+
+    def take(self):
+        """Return the stamped events polled so far and empty the queue."""
+        events = self.events
+        self.events = []
+        return events
+
+    def flapped(self, pressed):
+        """Note that a key press made the engine flap."""
+        self.pending.append(pressed)
+
+    def presented(self):
+        """Note that a frame was sent to the display."""
+        if self.pending:
+            now = time.perf_counter()
+            self.latencies.extend(now - pressed for pressed in self.pending)
+            self.pending = []
+
+    def report(self):
+        """Return the input to photon latency of the last flaps."""
+        if not self.latencies:
+            return "input latency: no flaps yet"
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return (f"input latency {statistics.fmean(latencies) * 1000:.1f} ms, "
+                f"median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+                f"max {latencies[-1] * 1000:.1f} ms over {len(latencies)} flaps")
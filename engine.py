@@ -0,0 +1,587 @@
+"""Headless simulation of Flappy Bird.
+
+The engine owns the bird physics, pipe spawning, scoring and collisions. It
+never touches pygame, so it can be stepped with a fixed time step and a seed
+as fast as the CPU allows, and FlappyBird only has to draw what it reports.
+"""
+import hashlib
+import math
+import operator
+import random
+import struct
+
+from settings import Settings
+
+# game statuses
+READY = 0  # settings, playbutton
+ACTIVE = 1 # jumping, updates, ...
+OVER = 2 # falling bird, stop motion, display scores
+
+# events reported by Engine.step
+RESET = "reset"
+WING = "wing"
+POINT = "point"
+HIT = "hit"
+DIE = "die"
+
+# Pipe pairs an EngineState has room for; the screen holds far fewer
+MAX_PIPES = 16
+
+# Layout of an EngineState: the game, the bird, the number of pipe pairs and
+# MAX_PIPES pairs, then the random generator's state
+STATE_LAYOUT = struct.Struct("<" + "BqdqqdBqqq" + "qqd?ddddd" + "B" + "dqqq??" * MAX_PIPES + "625I?d")
+_EMPTY_PIPE = (0.0, 0, 0, 0, False, False)
+
+def to_pixel(value):
+    """Round a position the way pygame.Rect does when it is assigned a float."""
+    magnitude = abs(value)
+    pixel = math.floor(magnitude)
+    if magnitude - pixel >= 0.5:
+        pixel += 1
+    return int(pixel) if value >= 0 else -int(pixel)
+
+def rects_collide(left, top, width, height, other_left, other_top, other_width, other_height):
+    """Check two rects for overlap with the same rules as pygame.Rect.colliderect."""
+    return (left < other_left + other_width and other_left < left + width
+            and top < other_top + other_height and other_top < top + height)
+
+def make_collider(settings):
+    """Return the narrow phase for settings.collision_mode, or None to test plain rects."""
+    if settings.collision_mode == "rect":
+        return None
+    if settings.collision_mode != "mask":
+        raise ValueError(f"unknown collision mode: {settings.collision_mode}")
+    # Masks need pygame, which the rest of the engine does without
+    from collision import MaskCollider
+    return MaskCollider.from_files(settings)
+
+def max_pipes(settings, schedule=None):
+    """Return the most pipe pairs that can be on the screen at once with these settings."""
+    distance = settings.pipe_distance if schedule is None else int(schedule["distance"].max())
+    spacing = settings.screen_width - distance
+    if spacing <= 0:
+        return math.inf
+    # A pair lives from the right edge until it is past the left one; one
+    # more for a pair that spawns a step late
+    return (settings.screen_width + settings.pipe_width) // spacing + 2
+
+def game_seed(seed):
+    """Return seed as an int that fits an EngineState, or None if it is None.
+
+    Ints in the signed 64 bit range are kept, so they play the same course
+    as always; bigger ints, strings and bytes are hashed down to 64 bits.
+    """
+    if seed is None:
+        return None
+    if isinstance(seed, str):
+        data = seed.encode()
+    elif isinstance(seed, (bytes, bytearray)):
+        data = bytes(seed)
+    else:
+        try:
+            seed = operator.index(seed)
+        except TypeError:
+            raise ValueError(f"a seed must be an int, str or bytes, not {seed!r}") from None
+        if -2 ** 63 <= seed < 2 ** 63:
+            return seed
+        data = str(seed).encode()
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "little", signed=True)
+
+def load_schedule(settings):
+    """Return the pipe schedule at settings.level_path, or None to draw random heights."""
+    if settings.level_path is None:
+        return None
+    # Schedules are NumPy arrays, which the rest of the engine does without
+    from levels import open_schedule
+    return open_schedule(settings.level_path)
+
+class GameStats:
+    """Track statistics for Fapping Bird."""
+
+    def __init__(self, fb_game):
+        """Initialize statistics."""
+        self.settings = fb_game.settings
+        self.reset_stats()
+
+        self.game_status = READY
+
+    def reset_stats(self):
+        """Initialize statistics that can change during the game."""
+        self.score = 0
+
+class BirdBody:
+    """The bird's position, velocities and rotation, without any image."""
+
+    __slots__ = ("settings", "width", "height", "left", "top", "y", "isjump", "velocity",
+                 "jumping_velocity", "jumping_height", "rotation_angle", "previous_rotation_angle")
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.width = settings.bird_width
+        self.height = settings.bird_height
+        self.reset()
+
+    def reset(self):
+        """Put the bird back at the center of the left half of the screen."""
+        # Same placement as setting rect.center on the bird's image rect
+        self.left = self.settings.screen_width // 2 // 2 - self.width // 2
+        self.top = self.settings.screen_height // 2 - self.height // 2
+
+        # Store a decimal value for the bird's vertical position
+        self.y = float(self.top)
+
+        # Flag for jumping
+        self.isjump = False
+
+        self.velocity = self.settings.bird_initial_velocity
+        self.jumping_velocity = self.settings.bird_initial_jumping_velocity
+        self.jumping_height = 0
+
+        self.rotation_angle = 0
+        self.previous_rotation_angle = 0
+
+    @property
+    def bottom(self):
+        return self.top + self.height
+
+    def update(self, dt):
+        """Update the bird's position based on gravity and jumping"""
+        if self.isjump:
+            distance_moved = dt * self.jumping_velocity
+            jumping_gravity = dt * self.settings.bird_gravity
+            self.y -= distance_moved
+            self.jumping_height += distance_moved
+
+            if self.rotation_angle < self.settings.bird_rise_angle:
+                self.rotation_angle = self.jumping_height / self.settings.bird_max_jumping_height * (self.settings.bird_rise_angle + self.previous_rotation_angle) - self.previous_rotation_angle
+            self.jumping_velocity -= jumping_gravity
+            if self.jumping_velocity <= 0:
+                self.isjump = False
+                self.velocity = self.settings.bird_initial_velocity
+                self.jumping_velocity = self.settings.bird_initial_jumping_velocity
+                self.jumping_height = 0
+                self.previous_rotation_angle = abs(self.rotation_angle)
+                return
+
+            self.top = to_pixel(self.y)
+            return
+
+        self.fall(dt)
+
+    def jump(self):
+        self.isjump = True
+        self.velocity = self.settings.bird_initial_velocity
+        self.jumping_velocity = self.settings.bird_initial_jumping_velocity
+        self.previous_rotation_angle = -self.rotation_angle
+
+        if self.jumping_height < 0 or self.jumping_height > self.settings.bird_max_jumping_height:
+            self.jumping_height = 0
+
+    def fall(self, dt):
+        distance_moved = dt * self.velocity
+        if self.jumping_height >= self.settings.bird_max_falling_height:
+            self.jumping_height -= distance_moved
+        if self.rotation_angle > self.settings.bird_fall_angle:
+            self.rotation_angle = self.jumping_height / self.settings.bird_max_falling_height * (self.settings.bird_fall_angle - self.previous_rotation_angle) + self.previous_rotation_angle
+
+        gravity = dt * self.settings.bird_gravity
+        self.y += distance_moved
+
+        if self.velocity < self.settings.bird_max_velocity:
+            self.velocity += gravity
+
+        self.top = to_pixel(self.y)
+
+    def lose_fall(self, dt):
+        if self.bottom >= self.settings.ground_height:
+            return
+        self.fall(dt)
+
+    def stop(self):
+        """Cancel any jump so the bird drops straight down after a crash."""
+        self.isjump = False
+        self.velocity = self.settings.bird_initial_velocity
+        self.jumping_velocity = self.settings.bird_initial_jumping_velocity
+        self.jumping_height = 0
+        self.previous_rotation_angle = abs(self.rotation_angle)
+
+class PipePair:
+    """A pipe facing down and a pipe facing up with a gap between them."""
+
+    __slots__ = ("settings", "width", "height", "top", "bottom", "x", "left", "latest", "scored", "active")
+
+    def __init__(self, settings, top, space=None):
+        """Create the pair just outside the right edge of the screen.
+
+        :param top: y of the gap's top edge, the bottom of the pipe facing down
+        :type top: int
+        :param space: height of the gap, settings.pipe_space if None
+        """
+        self.settings = settings
+        self.width = settings.pipe_width
+        self.height = settings.pipe_height
+        self.place(top, space)
+
+    def place(self, top, space=None):
+        """Put the pair back at the right edge of the screen with a new gap."""
+        self.top = top
+        self.bottom = top + (self.settings.pipe_space if space is None else space)
+
+        # store the pipes' exact horizontal position
+        self.x = float(self.settings.screen_width)
+        self.left = self.settings.screen_width
+
+        self.latest = True
+        self.scored = False
+        # False while the pair waits in the engine's pool
+        self.active = True
+
+    def update(self, dt, speed):
+        self.x -= dt * speed
+        self.left = to_pixel(self.x)
+
+    def offscreen(self):
+        return self.x <= -self.width
+
+    def collides(self, bird):
+        """Check the bird's rect against both pipes."""
+        return (rects_collide(bird.left, bird.top, bird.width, bird.height,
+                              self.left, self.top - self.height, self.width, self.height)
+                or rects_collide(bird.left, bird.top, bird.width, bird.height,
+                                 self.left, self.bottom, self.width, self.height))
+
+class EngineState:
+    """A snapshot of an Engine in one fixed-size buffer, laid out as STATE_LAYOUT."""
+
+    __slots__ = ("buffer",)
+
+    def __init__(self, data=None):
+        if data is not None and len(data) != STATE_LAYOUT.size:
+            raise ValueError(f"an engine state is {STATE_LAYOUT.size} bytes, not {len(data)}")
+        self.buffer = bytearray(STATE_LAYOUT.size) if data is None else bytearray(data)
+
+    def to_bytes(self):
+        return bytes(self.buffer)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data)
+
+    def copy(self):
+        return EngineState(self.buffer)
+
+class Engine:
+    """A complete game of Flappy Bird that advances in explicit time steps."""
+
+    def __init__(self, settings=None, seed=None, collider=None, schedule=None):
+        """Create a game in the READY status.
+
+        :param collider: object with a margin in pixels and a
+            collides(bird, pipe) method that decides whether the bird touches
+            a nearby pair; picked from settings.collision_mode if None
+        :param schedule: pipe schedule from the levels module that every game
+            plays from its first pair; loaded from settings.level_path if None
+        """
+        self.settings = settings if settings is not None else Settings()
+        self.collider = collider if collider is not None else make_collider(self.settings)
+        self.schedule = schedule if schedule is not None else load_schedule(self.settings)
+        # Checked up front, so snapshots and replays cannot fail in the middle of a game
+        if max_pipes(self.settings, self.schedule) > MAX_PIPES:
+            raise ValueError(f"pipe pairs spawn too close together: an engine state holds {MAX_PIPES} pairs, "
+                             f"but up to {max_pipes(self.settings, self.schedule)} can be on the screen")
+        self.seed = game_seed(seed)
+        self.random = random.Random(self.seed)
+        # Pipe heights drawn since the random generator was last seeded, or
+        # with a schedule, the index of the next pair in it
+        self.pipe_draws = 0
+        # Speed of every moving pair; a schedule changes it as pairs spawn
+        self.pipe_speed = self.settings.pipe_speed
+
+        self.stats = GameStats(self)
+        self.bird = BirdBody(self.settings)
+        self.pipes = []
+        # Index of the first pair the bird has not flown past, and of the
+        # first one it has not scored; pairs only ever move left, so both
+        # only move forward and each frame looks at the nearest pairs only
+        self.next_pipe = 0
+        self.next_score = 0
+
+        # Pipe pairs that left the screen, kept to be placed again
+        self.free_pipes = []
+        self.pipes_created = 0
+        self.pipes_reused = 0
+        self.events = []
+        self.reset()
+
+    def reset(self, seed=None):
+        """Start a new game, reseeding the pipe heights if a seed is given."""
+        if seed is not None:
+            self.seed = game_seed(seed)
+            self.random.seed(self.seed)
+            self.pipe_draws = 0
+
+        if self.schedule is not None:
+            self.pipe_draws = 0
+        self.pipe_speed = self.settings.pipe_speed
+
+        self.stats.reset_stats()
+        self.stats.game_status = READY
+        self.active_time = 0
+        self.frame = 0
+        self.bird.reset()
+        self._recycle_pipes(len(self.pipes))
+        self._create_pipe_pair()
+        self.events = [RESET]
+
+    def get_state(self):
+        """Return everything needed to continue this game later as plain data."""
+        bird = self.bird
+        return {
+            "status": self.stats.game_status,
+            "score": self.stats.score,
+            "active_time": self.active_time,
+            "frame": self.frame,
+            "bird": [bird.left, bird.top, bird.y, bird.isjump, bird.velocity, bird.jumping_velocity,
+                     bird.jumping_height, bird.rotation_angle, bird.previous_rotation_angle],
+            "pipes": [[pipe.x, pipe.left, pipe.top, pipe.latest, pipe.scored] for pipe in self.pipes],
+            # A seeded generator is restored by replaying its draws, which is
+            # far smaller than its full internal state
+            "random": self.random.getstate() if self.seed is None else None,
+            "seed": self.seed,
+            "pipe_draws": self.pipe_draws,
+        }
+
+    def set_state(self, state):
+        """Continue the game from a state returned by get_state."""
+        self.stats.game_status = state["status"]
+        self.stats.score = state["score"]
+        self.active_time = state["active_time"]
+        self.frame = state["frame"]
+
+        bird = self.bird
+        (bird.left, bird.top, bird.y, bird.isjump, bird.velocity, bird.jumping_velocity,
+         bird.jumping_height, bird.rotation_angle, bird.previous_rotation_angle) = state["bird"]
+
+        self.seed = state["seed"]
+        self.pipe_draws = state["pipe_draws"]
+
+        self._recycle_pipes(len(self.pipes))
+        self.next_pipe = self.next_score = 0
+        # The pairs on screen are the last ones drawn, so with a schedule
+        # their gaps and the current speed can be looked up again
+        first = self.pipe_draws - len(state["pipes"])
+        for index, (x, left, top, latest, scored) in enumerate(state["pipes"], first):
+            pipe = self._new_pipe_pair(top, None if self.schedule is None else int(self._entry(index)["space"]))
+            pipe.x, pipe.left, pipe.latest, pipe.scored = x, left, latest, scored
+            self.pipes.append(pipe)
+        self.pipe_speed = (self.settings.pipe_speed if self.schedule is None or self.pipe_draws == 0
+                           else float(self._entry(self.pipe_draws - 1)["speed"]))
+
+        if state["random"] is not None:
+            version, internal, gauss = state["random"]
+            self.random.setstate((version, tuple(internal), gauss))
+        elif self.schedule is None:
+            self.random.seed(self.seed)
+            for draw in range(self.pipe_draws):
+                self._draw_pipe_height()
+        self.events = []
+
+    def snapshot(self, state=None):
+        """Copy the game into an EngineState.
+
+        Unlike get_state this takes the same time at any point of a game, so
+        it suits rewinding and trying out many futures from one state.
+
+        :param state: EngineState to overwrite instead of creating a new one
+        """
+        state = state if state is not None else EngineState()
+        stats = self.stats
+        bird = self.bird
+        pipes = self.pipes
+        if len(pipes) > MAX_PIPES:
+            raise ValueError(f"an engine state holds at most {MAX_PIPES} pipe pairs, not {len(pipes)}")
+
+        values = [stats.game_status, stats.score, self.active_time, self.frame, self.pipe_draws, self.pipe_speed,
+                  self.seed is not None, self.seed or 0, self.next_pipe, self.next_score,
+                  bird.left, bird.top, bird.y, bird.isjump, bird.velocity, bird.jumping_velocity,
+                  bird.jumping_height, bird.rotation_angle, bird.previous_rotation_angle, len(pipes)]
+        for pipe in pipes:
+            values += (pipe.x, pipe.left, pipe.top, pipe.bottom, pipe.latest, pipe.scored)
+        values += _EMPTY_PIPE * (MAX_PIPES - len(pipes))
+        version, internal, gauss = self.random.getstate()
+        values += internal
+        values += (gauss is not None, gauss or 0.0)
+        STATE_LAYOUT.pack_into(state.buffer, 0, *values)
+        return state
+
+    def restore(self, state):
+        """Continue the game from an EngineState made by snapshot."""
+        values = STATE_LAYOUT.unpack_from(state.buffer)
+        stats = self.stats
+        bird = self.bird
+        (stats.game_status, stats.score, self.active_time, self.frame, self.pipe_draws, self.pipe_speed,
+         has_seed, seed, next_pipe, next_score) = values[:10]
+        self.seed = seed if has_seed else None
+        (bird.left, bird.top, bird.y, bird.isjump, bird.velocity, bird.jumping_velocity,
+         bird.jumping_height, bird.rotation_angle, bird.previous_rotation_angle, count) = values[10:20]
+
+        self._recycle_pipes(len(self.pipes))
+        for start in range(20, 20 + 6 * count, 6):
+            x, left, top, bottom, latest, scored = values[start:start + 6]
+            pipe = self._new_pipe_pair(top, bottom - top)
+            pipe.x, pipe.left, pipe.latest, pipe.scored = x, left, latest, scored
+            self.pipes.append(pipe)
+        self.next_pipe, self.next_score = next_pipe, next_score
+
+        start = 20 + 6 * MAX_PIPES
+        has_gauss, gauss = values[start + 625:]
+        self.random.setstate((3, values[start:start + 625], gauss if has_gauss else None))
+        self.events = []
+
+    def step(self, action=False, dt=None, at=0.0):
+        """Apply a flap if action is true, then advance the game by dt seconds.
+
+        :param at: seconds into the step when the flap happens, for input
+            that arrived between two frames; 0 flaps right at the start
+        Returns the events that happened during the step.
+        """
+        self.events = []
+        dt = self.settings.time_step if dt is None else dt
+        if action and at > 0:
+            at = min(at, dt)
+            self._move(at)
+            self.flap()
+            self._move(dt - at)
+            self.frame += 1
+            return self.events
+        if action:
+            self.flap()
+        self.advance(dt)
+        return self.events
+
+    def flap(self):
+        """React to the jump key the same way in every game status."""
+        if self.stats.game_status == ACTIVE:
+            self.bird.jump()
+            self.events.append(WING)
+        elif self.stats.game_status == READY:
+            self.stats.game_status = ACTIVE
+            self.bird.jump()
+            self.events.append(WING)
+        elif self.stats.game_status == OVER:
+            self.reset()
+
+    def advance(self, dt):
+        """Move everything in the game by dt seconds without any input."""
+        self._move(dt)
+        self.frame += 1
+
+    def _move(self, dt):
+        if self.stats.game_status == ACTIVE:
+            self.active_time += dt
+            self.bird.update(dt)
+            self._update_pipes(dt)
+            self._check_ground()
+        elif self.stats.game_status == OVER:
+            self.bird.lose_fall(dt)
+
+    def _update_pipes(self, dt):
+        if self.active_time < self.settings.pipe_start_time:
+            return
+        self._move_pipes(dt)
+
+        # Check bird and pipes collisions
+        for pipe in self._nearby_pipes():
+            if pipe.collides(self.bird) if self.collider is None else self.collider.collides(self.bird, pipe):
+                self._bird_hit()
+                self.events.append(DIE)
+                self.bird.stop()
+                return
+
+        # Check if bird crossed the pipe
+        pipes = self.pipes
+        while self.next_score < len(pipes) and pipes[self.next_score].left <= self.bird.left:
+            pipe = pipes[self.next_score]
+            if not pipe.scored:
+                pipe.scored = True
+                self.stats.score += 1
+                self.events.append(POINT)
+            self.next_score += 1
+
+    def _move_pipes(self, dt):
+        """Move the pairs, pool the ones that left the screen and spawn the next one when it is due."""
+        for pipe in self.pipes:
+            pipe.update(dt, self.pipe_speed)
+        # Pairs move together, so the ones that left the screen are the oldest
+        offscreen = 0
+        while offscreen < len(self.pipes) and self.pipes[offscreen].offscreen():
+            offscreen += 1
+        self._recycle_pipes(offscreen)
+        last_pipe = self.pipes[-1]
+        distance = self.settings.pipe_distance if self.schedule is None else self._entry(self.pipe_draws)["distance"]
+        if last_pipe.left <= distance and last_pipe.latest:
+            self._create_pipe_pair()
+            last_pipe.latest = False
+
+    def _nearby_pipes(self):
+        """Yield the pairs whose columns overlap the bird's, widened by the collider's margin."""
+        bird = self.bird
+        pipes = self.pipes
+        margin = 0 if self.collider is None else self.collider.margin
+        while self.next_pipe < len(pipes) and pipes[self.next_pipe].left + pipes[self.next_pipe].width <= bird.left - margin:
+            self.next_pipe += 1
+        index = self.next_pipe
+        while index < len(pipes) and pipes[index].left < bird.left + bird.width + margin:
+            yield pipes[index]
+            index += 1
+
+    def _create_pipe_pair(self):
+        """Create the pipe pair: One facing down and one facing up."""
+        if self.schedule is None:
+            random_height = self._draw_pipe_height()
+            self.pipe_draws += 1
+            self.pipes.append(self._new_pipe_pair(random_height))
+            return
+
+        entry = self._entry(self.pipe_draws)
+        self.pipe_draws += 1
+        self.pipes.append(self._new_pipe_pair(int(entry["top"]), int(entry["space"])))
+        self.pipe_speed = float(entry["speed"])
+
+    def _entry(self, index):
+        """Return a pair of the schedule; a course that runs out starts over."""
+        return self.schedule[index % len(self.schedule)]
+
+    def _new_pipe_pair(self, top, space=None):
+        """Take a pair from the pool, or create one if the pool is empty."""
+        if self.free_pipes:
+            self.pipes_reused += 1
+            pipe = self.free_pipes.pop()
+            pipe.place(top, space)
+            return pipe
+        self.pipes_created += 1
+        return PipePair(self.settings, top, space)
+
+    def _recycle_pipes(self, count):
+        """Move the oldest pipe pairs back into the pool."""
+        for pipe in self.pipes[:count]:
+            pipe.active = False
+            self.free_pipes.append(pipe)
+        del self.pipes[:count]
+        self.next_pipe = max(self.next_pipe - count, 0)
+        self.next_score = max(self.next_score - count, 0)
+
+    def _draw_pipe_height(self):
+        return self.random.randint(self.settings.pipe_min_top, self.settings.pipe_max_top)
+
+    def _check_ground(self):
+        """End the game if the bird touches the ground."""
+        if self.stats.game_status != ACTIVE:
+            return
+        if self.bird.bottom > self.settings.ground_height and self.bird.top < self.settings.ground_height + self.settings.ground_tile_height:
+            self._bird_hit()
+
+    def _bird_hit(self):
+        """Sending "bird dead" statuses to elements."""
+        self.stats.game_status = OVER
+        self.events.append(HIT)
@@ -0,0 +1,236 @@
+"""A reinforcement learning interface to the game.
+
+BatchEnv steps many headless games at once on a BatchEngine and describes
+each of them with a few float32 numbers:
+
+    bird_y         top of the bird, as a fraction of the screen height
+    bird_velocity  downward speed, as a fraction of bird_max_velocity
+    pipe_distance  from the bird's left edge to the right edge of the next
+                   pipe pair, as a fraction of the screen width
+    gap_y          middle of that pair's gap, as a fraction of the screen height
+
+PixelEnv plays a single game through the real renderer and observes
+downsampled grayscale frames of the screen instead.
+
+Both follow the gym conventions: reset(seed) returns observations and
+step(actions) returns observations, rewards and done flags. A flap is
+applied on the first frame of a step and the following frame_skip - 1
+frames run without input.
+
+    python env.py --games 1024 --frame-skip 4     measure steps per second
+"""
+import argparse
+import time
+
+import numpy as np
+
+from batch_engine import BatchEngine
+from engine import READY, OVER
+from settings import Settings
+
+OBSERVATION_FIELDS = ("bird_y", "bird_velocity", "pipe_distance", "gap_y")
+
+# Rewards for staying alive one frame, for scoring a point and for crashing
+ALIVE_REWARD = 0.1
+POINT_REWARD = 1.0
+HIT_REWARD = -1.0
+
+def observe(engine, out=None):
+    """Return the observation of a single Engine, like one row of BatchEnv's."""
+    settings = engine.settings
+    bird = engine.bird
+    out = np.empty(len(OBSERVATION_FIELDS), dtype=np.float32) if out is None else out
+
+    velocity = -bird.jumping_velocity if bird.isjump else bird.velocity
+    distance = settings.screen_width
+    gap = settings.screen_height / 2
+    # Pairs are ordered oldest first, so the first one ahead of the bird is the next
+    for pipe in engine.pipes:
+        if pipe.left + pipe.width > bird.left:
+            distance = pipe.left + pipe.width - bird.left
+            gap = (pipe.top + pipe.bottom) / 2
+            break
+
+    out[0] = bird.y / settings.screen_height
+    out[1] = velocity / settings.bird_max_velocity
+    out[2] = distance / settings.screen_width
+    out[3] = gap / settings.screen_height
+    return out
+
+class BatchEnv:
+    """n headless games stepped together, restarting each one as soon as it ends."""
+
+    def __init__(self, n, settings=None, frame_skip=1):
+        self.n = n
+        self.settings = settings if settings is not None else Settings()
+        self.frame_skip = frame_skip
+        self.engine = BatchEngine(n, self.settings)
+
+        # Reused every step; callers that keep results across steps must copy them
+        self.observations = np.zeros((n, len(OBSERVATION_FIELDS)), dtype=np.float32)
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.dones = np.zeros(n, dtype=bool)
+        self.scores = np.zeros(n, dtype=np.int64)
+
+    def reset(self, seed=None):
+        """Start every game; game i is seeded with seed + i if a seed is given."""
+        self.engine.reset(seeds=None if seed is None else seed + np.arange(self.n))
+        self._start(np.ones(self.n, dtype=bool))
+        return self.observe()
+
+    def step(self, actions):
+        """Flap where actions is true and run frame_skip frames.
+
+        Returns observations, rewards and done flags. A game that ended is
+        restarted right away, so its observation already belongs to the next
+        game; its final score is left in scores.
+        """
+        engine = self.engine
+        self.rewards[:] = 0
+        self.dones[:] = False
+        for frame in range(self.frame_skip):
+            points, hits = engine.step(actions if frame == 0 else None)
+            alive = ~self.dones
+            self.rewards += alive * (ALIVE_REWARD + POINT_REWARD * points + HIT_REWARD * hits)
+            self.dones |= hits
+
+        if self.dones.any():
+            ended = np.flatnonzero(self.dones)
+            self.scores[ended] = engine.score[ended]
+            engine.reset(ended)
+            self._start(self.dones)
+        return self.observe(), self.rewards, self.dones
+
+    def _start(self, mask):
+        """Take games out of the READY status with their first flap."""
+        self.engine.flap(mask & (self.engine.status == READY))
+
+    def observe(self):
+        """Fill the observations of every game from the engine's arrays."""
+        engine = self.engine
+        s = self.settings
+        velocity = np.where(engine.isjump, -engine.jumping_velocity, engine.velocity)
+
+        # The nearest pair whose right edge is still ahead of the bird
+        ahead = engine.pipe_alive & (engine.pipe_left + s.pipe_width > engine.bird_left)
+        lefts = np.where(ahead, engine.pipe_left, np.iinfo(np.int64).max)
+        nearest = lefts.argmin(axis=1)
+        rows = np.arange(self.n)
+        found = ahead[rows, nearest]
+        distance = np.where(found, engine.pipe_left[rows, nearest] + s.pipe_width - engine.bird_left, s.screen_width)
+        gap = np.where(found, (engine.pipe_top[rows, nearest] + engine.pipe_bottom[rows, nearest]) / 2, s.screen_height / 2)
+
+        out = self.observations
+        out[:, 0] = engine.bird_y / s.screen_height
+        out[:, 1] = velocity / s.bird_max_velocity
+        out[:, 2] = distance / s.screen_width
+        out[:, 3] = gap / s.screen_height
+        return out
+
+class PixelEnv:
+    """One game drawn by the real renderer, observed as downsampled grayscale frames."""
+
+    def __init__(self, settings=None, frame_skip=1, downsample=4):
+        """Create the game window.
+
+        Run with SDL_VIDEODRIVER=dummy to train without one. Games played
+        here never touch the player's highscore or stats log unless the
+        given settings point at them.
+
+        :param downsample: keep every n-th pixel in both directions
+        """
+        # The renderer needs pygame, the vector environment does not
+        import flappy_bird
+        import pygame.surfarray
+
+        if settings is None:
+            settings = Settings().override(highscore_path=None, stats_path=None)
+        self.fb_game = flappy_bird.FlappyBird(settings)
+        self.settings = self.fb_game.settings
+        self.frame_skip = frame_skip
+        self.downsample = downsample
+        self.pixels3d = pygame.surfarray.pixels3d
+
+        width, height = self.fb_game.screen_rect.size
+        width = (width + downsample - 1) // downsample
+        height = (height + downsample - 1) // downsample
+        # Grayscale is worked out in these buffers, so a step allocates no frames
+        self.frame = np.zeros((width, height), dtype=np.uint8)
+        self._gray = np.zeros((width, height), dtype=np.uint16)
+        self._channel = np.zeros((width, height), dtype=np.uint16)
+
+    def reset(self, seed=None):
+        """Start a new game with its first flap and return its first frame."""
+        fb_game = self.fb_game
+        fb_game.engine.reset(seed)
+        fb_game.engine.flap()
+        fb_game._sync_after_jump()
+        fb_game._update_screen()
+        return self.observe()
+
+    def step(self, action):
+        """Flap if action is true and play frame_skip frames; returns frame, reward and done."""
+        fb_game = self.fb_game
+        reward = 0.0
+        for frame in range(self.frame_skip):
+            score = fb_game.stats.score
+            fb_game.settings.time_passed_seconds = self.settings.time_step
+            fb_game.flap_requested = bool(action) and frame == 0
+            fb_game._update_frame()
+            reward += ALIVE_REWARD + POINT_REWARD * (fb_game.stats.score - score)
+            if fb_game.stats.game_status == OVER:
+                reward += HIT_REWARD
+                break
+        fb_game._update_screen()
+        return self.observe(), reward, fb_game.stats.game_status == OVER
+
+    def observe(self):
+        """Return the screen as grayscale, indexed [x, y] like pygame.surfarray.
+
+        The array is overwritten by the next call; copy it to keep it.
+        """
+        pixels = self.pixels3d(self.fb_game.screen)
+        # A view into the screen's memory; nothing is copied until the sum below
+        view = pixels[::self.downsample, ::self.downsample]
+        np.multiply(view[..., 0], 77, out=self._gray, dtype=np.uint16)
+        for channel, weight in ((1, 150), (2, 29)):
+            np.multiply(view[..., channel], weight, out=self._channel, dtype=np.uint16)
+            self._gray += self._channel
+        np.right_shift(self._gray, 8, out=self._gray)
+        self.frame[:] = self._gray
+        # The screen stays locked while a pixel view of it exists
+        del view, pixels
+        return self.frame
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast the environment steps with random flaps.")
+    parser.add_argument("--games", type=int, default=1024)
+    parser.add_argument("--frame-skip", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--pixels", action="store_true", help="step a PixelEnv instead of a BatchEnv")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.pixels:
+        env = PixelEnv(frame_skip=args.frame_skip)
+        env.reset(0)
+        start = time.perf_counter()
+        for step in range(args.steps):
+            frame, reward, done = env.step(rng.random() < 0.1)
+            if done:
+                env.reset()
+        games = 1
+    else:
+        env = BatchEnv(args.games, frame_skip=args.frame_skip)
+        env.reset(0)
+        actions = rng.random((args.steps, args.games)) < 0.1
+        start = time.perf_counter()
+        for step in range(args.steps):
+            env.step(actions[step])
+        games = args.games
+    elapsed = time.perf_counter() - start
+    print(f"{games * args.steps / elapsed:.0f} env steps/s, "
+          f"{games * args.steps * args.frame_skip / elapsed:.0f} frames/s")
+
+if __name__ == "__main__":
+    main()
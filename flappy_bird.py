@@ -1,13 +1,232 @@
+import argparse
 import pygame
-import random
+import threading
+import time
+from collections import deque
 from pygame.locals import *
 from pygame.sprite import Sprite
 from sys import exit
 
-# game statuses
-READY = 0  # settings, playbutton
-ACTIVE = 1 # jumping, updates, ...
-OVER = 2 # falling bird, stop motion, display scores
+from assetpack import load_image, open_pack
+from audio import SoundManager
+from collision import RotationCache
+from controls import InputQueue
+from engine import Engine, to_pixel, READY, ACTIVE, OVER, RESET, WING, POINT, HIT, DIE
+from pacing import Pacer
+from persistence import ScoreStore
+from profiler import FrameProfiler
+from replay import ReplayReader, ReplayWriter, new_seed
+from settings import Settings
+
+# Pixels the background scrolls at a time in dirty mode, unless
+# Settings.background_scroll_step says otherwise
+DIRTY_SCROLL_STEP = 8
+
+# phases of a frame timed by the profiler, in the order they run
+PROFILE_PHASES = ("clock.tick", "_check_events", "engine.step", "bird.update", "_update_pipes",
+                  "_update_grounds", "moving_background.update", "_update_screen", "display.update")
+
+def scaled(value, scale):
+    """Turn a length or position in screen units into window pixels."""
+    return value if scale == 1 else to_pixel(value * scale)
+
+class Assets:
+    """Load every image, font and sound once and hand out the shared objects.
+
+    Images and fonts come at the window's scale, so nothing is scaled while
+    a frame is drawn. Whatever the asset pack holds is taken from it instead
+    of being decoded from the loose file.
+    """
+
+    def __init__(self, scale=1.0, pack=None):
+        self.scale = scale
+        self.pack = pack
+        self.images = {}
+        self.fonts = {}
+        self.sounds = {}
+
+        # How many times each asset was actually read from disk, how many times
+        # it was served from the cache, and how long the loads took in seconds.
+        self.load_counts = {}
+        self.hit_counts = {}
+        self.load_times = {}
+
+        # Sounds can be decoded on a background thread; the lock makes a
+        # request for one that is being decoded wait instead of decoding it twice
+        self.lock = threading.Lock()
+        self.preloader = None
+        self.preload_seconds = None
+
+    def image(self, path, alpha=True, scale=None):
+        """Return the converted surface for an image, loading it on first use.
+
+        :param alpha: convert with per-pixel alpha, otherwise plain convert
+        :type alpha: bool
+        :param scale: size relative to the file, the window's scale if None
+        """
+        scale = self.scale if scale is None else scale
+        key = (path, alpha, scale)
+        if key not in self.images:
+            start = time.perf_counter()
+            if scale == 1:
+                image = load_image(path, self.pack)
+                image = image.convert_alpha() if alpha else image.convert()
+            else:
+                # Scaled once from the image at its own size
+                image = self.image(path, alpha, 1)
+                image = pygame.transform.smoothscale(image, (max(1, round(image.get_width() * scale)),
+                                                             max(1, round(image.get_height() * scale))))
+            self.images[key] = image
+            self._count_load(key, start)
+        else:
+            self._count_hit(key)
+        return self.images[key]
+
+    def font(self, path, size):
+        """Return the font for a path and size, opening it on first use."""
+        key = (path, size)
+        if key not in self.fonts:
+            start = time.perf_counter()
+            source = self.pack.file(path) if self.pack is not None and path in self.pack else path
+            self.fonts[key] = pygame.font.Font(source, max(1, round(size * self.scale)))
+            self._count_load(key, start)
+        else:
+            self._count_hit(key)
+        return self.fonts[key]
+
+    def sound(self, path):
+        """Return the decoded sound for a path, decoding it on first use."""
+        with self.lock:
+            if path not in self.sounds:
+                start = time.perf_counter()
+                self.sounds[path] = self.pack.sound(path) if self.pack is not None and path in self.pack else pygame.mixer.Sound(path)
+                self._count_load(path, start)
+            else:
+                self._count_hit(path)
+            return self.sounds[path]
+
+    def loaded_sound(self, path):
+        """Return a sound if it is decoded already, None while it is still being loaded."""
+        return self.sounds.get(path)
+
+    def preload(self, sounds, before=None):
+        """Decode sounds on a background thread.
+
+        :param before: function the thread calls first, like initializing the mixer
+        """
+        self.preloader = threading.Thread(target=self._preload, args=(list(sounds), before),
+                                          name="Assets.preload", daemon=True)
+        self.preloader.start()
+
+    def _preload(self, sounds, before):
+        start = time.perf_counter()
+        if before:
+            before()
+        for path in sounds:
+            self.sound(path)
+        self.preload_seconds = time.perf_counter() - start
+
+    def wait(self):
+        """Block until the background loads are done."""
+        if self.preloader:
+            self.preloader.join()
+
+    def _count_load(self, key, start):
+        self.load_counts[key] = self.load_counts.get(key, 0) + 1
+        self.load_times[key] = self.load_times.get(key, 0.0) + time.perf_counter() - start
+
+    def _count_hit(self, key):
+        self.hit_counts[key] = self.hit_counts.get(key, 0) + 1
+
+    def report(self):
+        """Return one line per asset with its load count, cache hits and load time."""
+        lines = []
+        for key in self.load_counts:
+            name = key if isinstance(key, str) else f"{key[0]} ({', '.join(str(part) for part in key[1:])})"
+            lines.append(f"{name}: loaded {self.load_counts[key]}x, "
+                         f"{self.hit_counts.get(key, 0)} cache hits, "
+                         f"{self.load_times[key] * 1000:.2f} ms")
+        total = sum(self.load_times.values())
+        lines.append(f"total load time: {total * 1000:.2f} ms")
+        return "\n".join(lines)
+
+class TextCache:
+    """Rendered texts and single glyphs, so numbers that change are composed
+    from cached digits instead of going through font.render every time."""
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.texts = {}
+        self.glyphs = {}
+
+        # font.render calls, and numbers put together from glyphs
+        self.renders = 0
+        self.compositions = 0
+
+    def text(self, path, size, text, color):
+        """Return the image of a fixed text, rendering it on first use."""
+        key = (path, size, text, color)
+        if key not in self.texts:
+            self.texts[key] = self.assets.font(path, size).render(text, False, color, None)
+            self.renders += 1
+        return self.texts[key]
+
+    def glyph(self, path, size, char, color):
+        """Return the image of a single character and how far it advances the pen."""
+        key = (path, size, char, color)
+        if key not in self.glyphs:
+            font = self.assets.font(path, size)
+            self.glyphs[key] = (font.render(char, False, color, None), font.metrics(char)[0][4])
+            self.renders += 1
+        return self.glyphs[key]
+
+    def number(self, path, size, value, color, prefix=""):
+        """Return an image of a fixed prefix followed by a number, built from cached glyphs."""
+        label = self.text(path, size, prefix, color) if prefix else None
+        glyphs = [self.glyph(path, size, char, color) for char in str(value)]
+        x = label.get_width() if label else 0
+        image = pygame.Surface((x + sum(advance for glyph, advance in glyphs), glyphs[0][0].get_height()), SRCALPHA)
+        if label:
+            image.blit(label, (0, 0))
+        for glyph, advance in glyphs:
+            image.blit(glyph, (x, 0))
+            x += advance
+        self.compositions += 1
+        return image
+
+    def memory(self):
+        """Return the bytes held by the cached surfaces."""
+        surfaces = list(self.texts.values()) + [glyph for glyph, advance in self.glyphs.values()]
+        return sum(surface.get_pitch() * surface.get_height() for surface in surfaces)
+
+    def report(self):
+        return (f"text cache {len(self.texts)} texts + {len(self.glyphs)} glyphs, "
+                f"{self.memory() / 1024:.1f} KiB, {self.renders} renders, {self.compositions} numbers composed")
+
+class RenderStats:
+    """Frame times and pixels pushed to the display by _update_screen."""
+
+    def __init__(self, screen_rect):
+        self.screen_pixels = screen_rect.width * screen_rect.height
+        self.frames = 0
+        self.full_frames = 0
+        self.seconds = 0.0
+        self.pixels = 0
+
+    def add(self, seconds, pixels):
+        self.frames += 1
+        self.seconds += seconds
+        self.pixels += pixels
+        if pixels >= self.screen_pixels:
+            self.full_frames += 1
+
+    def report(self):
+        """Return the average frame time and screen area touched per frame."""
+        frames = max(self.frames, 1)
+        return (f"{self.frames} frames, {self.seconds / frames * 1000:.3f} ms/frame, "
+                f"{self.pixels / frames:.0f} pixels/frame "
+                f"({self.pixels / frames / self.screen_pixels:.1%} of the screen), "
+                f"{self.full_frames} full redraws")
 
 class Bird(Sprite):
     def __init__(self, fb_game):
@@ -15,87 +234,46 @@ class Bird(Sprite):
         self.screen = fb_game.screen
         self.settings = fb_game.settings
         self.screen_rect = fb_game.screen_rect
+        self.scale = fb_game.scale
+
+        # The engine's bird decides where the sprite is drawn
+        self.body = fb_game.engine.bird
 
         # Load the bird image and get its rect
-        self.original_image = pygame.image.load("bird.png").convert_alpha()
-        self.image = pygame.image.load("bird.png").convert_alpha()
+        self.original_image = fb_game.assets.image("bird.png")
+        self.image = self.original_image
         self.rect = self.image.get_rect()
 
-        # Start each new bird at the center of the screen
-        # self.rect.center = self.screen_rect.center
-        self.rect.center = (self.screen_rect.centerx // 2, self.screen_rect.centery)
+        # Every rotation the bird can show, rendered once up front
+        self.rotations = RotationCache(self.original_image, self.settings.bird_fall_angle,
+                                       self.settings.bird_rise_angle, self.settings.bird_rotation_step)
+        self.image_offset = (0, 0)
+        self.previous = None
+        self.update()
 
-        # Store a decimal value for the bird's vertical position
-        self.y = float(self.rect.y)
-
-        # Flag for jumping
-        self.isjump = False
-
-        self.rotation_angle = 0
-        self.previous_rotation_angle = 0
+    def update(self):
+        """Move the sprite to the engine's bird position and rotation."""
+        self.rect.topleft = (scaled(self.body.left, self.scale), scaled(self.body.top, self.scale))
+        self.rotate()
 
-        self.rotation_range = self.settings.bird_fall_angle
+    def remember(self):
+        """Keep the engine's bird position from before the next step."""
+        self.previous = (self.body.left, self.body.top)
 
-    def update(self):
-        """Update the bird's position based on gravity and jumping"""
-        if self.isjump:
-            self.distance_moved = self.settings.time_passed_seconds * self.settings.bird_jumping_velocity
-            self.bird_jumping_gravity = self.settings.time_passed_seconds * self.settings.bird_gravity
-            self.y -= self.distance_moved
-            self.settings.bird_jumping_height += self.distance_moved
-
-            if self.rotation_angle < self.settings.bird_rise_angle:
-                self.rotation_angle = self.settings.bird_jumping_height / self.settings.bird_max_jumping_height * (self.settings.bird_rise_angle + self.previous_rotation_angle) - self.previous_rotation_angle
-            self.image = pygame.transform.rotate(self.original_image, self.rotation_angle)
-            self.settings.bird_jumping_velocity -= self.bird_jumping_gravity
-            if self.settings.bird_jumping_velocity <= 0:
-                self.isjump = False
-                self.settings.bird_velocity = self.settings.bird_initial_velocity
-                self.settings.bird_jumping_velocity = self.settings.bird_initial_jumping_velocity
-                self.settings.bird_jumping_height = 0
-                self.previous_rotation_angle = abs(self.rotation_angle)
-                return
-
-            self.rect.y = self.y
+    def interpolate(self, alpha):
+        """Draw the bird alpha of the way from its remembered position to the current one."""
+        if self.previous is None:
             return
+        left, top = self.previous
+        self.rect.topleft = (scaled(left + (self.body.left - left) * alpha, self.scale),
+                             scaled(top + (self.body.top - top) * alpha, self.scale))
 
-        self.fall()
+    def rotate(self):
+        """Show the cached frame for the current rotation angle."""
+        self.image, self.image_offset = self.rotations.frame(self.body.rotation_angle)
 
     def blitme(self):
-        self.screen.blit(self.image, self.rect)
-
-    def jump(self):
-        self.isjump = True
-        self.settings.bird_velocity = self.settings.bird_initial_velocity
-        self.settings.bird_jumping_velocity = self.settings.bird_initial_jumping_velocity
-        self.previous_rotation_angle = -self.rotation_angle
-
-        if self.settings.bird_jumping_height < 0 or self.settings.bird_jumping_height > self.settings.bird_max_jumping_height:
-            self.settings.bird_jumping_height = 0
-    
-    def fall(self):
-        self.distance_moved = self.settings.time_passed_seconds * self.settings.bird_velocity
-        if self.settings.bird_jumping_height >= self.settings.bird_max_falling_height:
-            self.settings.bird_jumping_height -= self.distance_moved
-        if self.rotation_angle > self.settings.bird_fall_angle:
-            self.rotation_angle = self.settings.bird_jumping_height / self.settings.bird_max_falling_height * (self.settings.bird_fall_angle - self.previous_rotation_angle) + self.previous_rotation_angle
-        self.image = pygame.transform.rotate(self.original_image, self.rotation_angle)
-
-        self.bird_gravity = self.settings.time_passed_seconds * self.settings.bird_gravity
-        self.y += self.distance_moved
-
-        if self.settings.bird_velocity < self.settings.bird_max_velocity:
-            self.settings.bird_velocity += self.bird_gravity
-
-        self.rect.y = self.y
-
-    def lose_fall(self):
-        if self.rect.bottom >= self.settings.ground_height:
-            return
-        self.fall()
-
-    def float(self):
-        pass
+        self.screen.blit(self.image, self.rect.move(self.image_offset))
 
 class MovingBackground(Sprite):
     def __init__(self, fb_game):
@@ -105,7 +283,7 @@ class MovingBackground(Sprite):
         self.screen_rect = self.screen.get_rect()
 
         # Load the background image and set its rect attribute
-        self.image = pygame.image.load("background.jpg").convert()
+        self.image = fb_game.assets.image("background.jpg", alpha=False)
         self.rect = self.image.get_rect()
         # Location for the second image
         self.rect2 = self.image.get_rect()
@@ -119,9 +297,17 @@ class MovingBackground(Sprite):
         self.x2 = float(self.rect2.x)
 
         self.background_width = self.image.get_width()
-        
+        self.speed = self.settings.background_speed * fb_game.scale
+
+        # A prescrolled strip of copies of the background, so any scroll
+        # position can be drawn with a single blit
+        copies = self.screen_rect.width // self.background_width + 2
+        self.strip = pygame.Surface((self.background_width * copies, self.rect.height)).convert()
+        for copy in range(copies):
+            self.strip.blit(self.image, (copy * self.background_width, 0))
+
     def update(self):
-        self.distance_moved = self.settings.time_passed_seconds * self.settings.background_speed
+        self.distance_moved = self.settings.time_passed_seconds * self.speed
         self.x += self.distance_moved
         self.x2 += self.distance_moved
 
@@ -130,25 +316,22 @@ class MovingBackground(Sprite):
             self.x2 = self.background_width
 
         self.rect.x = self.x
-        self.rect2.x = self.x2 
+        self.rect2.x = self.x2
+        step = self.settings.background_scroll_step
+        if step is None:
+            # Every scroll redraws the whole screen in dirty mode, so scroll less often there
+            step = DIRTY_SCROLL_STEP if self.settings.render_mode == "dirty" else 1
+        if step > 1:
+            self.rect.x -= self.rect.x % step
+            self.rect2.x = self.rect.right
 
     def blitme(self):
         self.screen.blit(self.image, self.rect)
         self.screen.blit(self.image, self.rect2)
 
-class GameStats:
-    """Track statistics for Fapping Bird."""
-
-    def __init__(self, fb_game):
-        """Initialize statistics."""
-        self.settings = fb_game.settings
-        self.reset_stats()
-
-        self.game_status = READY
-
-    def reset_stats(self):
-        """Initialize statistics that can change during the game."""
-        self.score = 0
+    def blit_strip(self):
+        """Draw the background from the prescrolled strip in one blit."""
+        self.screen.blit(self.strip, (0, 0), self.screen_rect.move(-self.rect.x, -self.rect.y))
 
 class Ground(Sprite):
     def __init__(self, fb_game):
@@ -157,13 +340,15 @@ class Ground(Sprite):
         self.screen = fb_game.screen
         self.settings = fb_game.settings
         self.screen_rect = fb_game.screen_rect
+        self.engine = fb_game.engine
+        self.scale = fb_game.scale
 
         # Load the ground image and set its rect attribute
-        self.image = pygame.image.load("ground.png").convert_alpha()
+        self.image = fb_game.assets.image("ground.png")
         self.rect = self.image.get_rect()
         
         # Start the first ground at the bottom left
-        self.rect.y = self.settings.ground_height
+        self.rect.y = scaled(self.settings.ground_height, self.scale)
 
 
         # Store the first ground's exact horizontal position
@@ -171,96 +356,16 @@ class Ground(Sprite):
 
     def update(self):
         """Move the ground to the left of the screen."""
-        self.distance_moved = self.settings.time_passed_seconds * self.settings.ground_speed
+        # Keep pace with the pipes when a pipe schedule speeds them up
+        speed = self.settings.ground_speed * self.engine.pipe_speed / self.settings.pipe_speed * self.scale
+        self.distance_moved = self.settings.time_passed_seconds * speed
         self.x -= self.distance_moved
-        
-        if self.x <= -self.rect.width:
-            self.kill()
         self.rect.x = self.x
 
+    def offscreen(self):
+        return self.x <= -self.rect.width
 
 
-class Settings:
-    def __init__(self):
-        """Initialize the game's static settings."""
-        # Screen settings
-        self.screen_width = 1000
-        self.screen_height = 680
-        self.bg_color = (255, 255, 255) # unnecessary because the background image covers the entire background
-        self.screen_flags = 0
-        self.screen_depth = 32
-
-        # Bird settings
-        # gravity
-        self.bird_gravity = 2500
-        self.bird_initial_velocity = 0
-        self.bird_max_velocity = 2000
-        # jumping
-        self.bird_initial_jumping_velocity = 600
-        self.bird_max_jumping_height = self.bird_initial_jumping_velocity / self.bird_gravity / 2 * self.bird_initial_jumping_velocity
-        # rotation
-        self.bird_rise_angle = 25
-        self.bird_fall_angle = -60
-        self.bird_max_falling_height = -300
-        
-        # Ground settings
-        self.ground_speed = 200
-        self.ground_height = self.screen_height - 100
-
-        # Pipe settings
-        self.pipe_speed = self.ground_speed # matches the ground speed because...
-        self.pipe_space = 200 # space between the up and down pipes
-        self.pipe_distance = self.screen_width - 300 # frequency of pipes
-        self.pipe_initial_height = 100
-        # pipe facing down
-        self.pipe_min_top = self.pipe_initial_height
-        self.pipe_max_top = self.ground_height - self.pipe_initial_height - self.pipe_space
-
-        # Background settings
-        self.background_speed = -50.0
-
-        # Ready messages settings
-        self.ready_font_path = "score_font.ttf" # same as score font
-        self.flappy_font_path = self.ready_font_path
-        self.flappy_font_size = 100
-        self.flappy_text_color = (237, 112, 20)
-        self.getready_font_path = self.ready_font_path
-        self.getready_font_size = 80
-        self.getready_text_color = (60, 176, 67)
-        self.press_font_path = self.ready_font_path
-        self.press_font_size = 50
-        self.press_text_color = (0, 0, 0)
-
-        # Over messages settings
-        self.gameover_font_path = self.ready_font_path
-        self.gameover_font_size = 100
-        self.gameover_text_color = (178, 34, 34)
-        self.score_rect_color = (0, 0, 0)
-        self.score_font_path = self.ready_font_path
-        self.score_font_size = 50
-        self.score_text_color = (255, 255, 255)
-        self.highscore_font_path = self.score_font_path
-        self.highscore_font_size = 50
-        self.highscore_text_color = (255, 255, 255)
-        self.border_width = 10
-        self.border_color = (0, 150, 0)
-
-        # Scoreboard settings
-        self.activescore_font_path = self.ready_font_path
-        self.activescore_font_size = 100
-        self.activescore_color = (0, 0, 0)
-
-        self.initialize_dynamic_settings()
-
-    def initialize_dynamic_settings(self):
-        """Initialize settings that change throughout the game."""
-        self.bird_velocity = self.bird_initial_velocity
-        self.bird_jumping_height = 0
-        self.bird_falling_height = 0
-        self.bird_jumping_velocity = self.bird_initial_jumping_velocity
-        self.time_passed_seconds = 0.0
-        self.active_time = 0
-
 
 class Scoreboard:
     """A class to report scoring information while game is ACTIVE."""
@@ -273,7 +378,7 @@ class Scoreboard:
         self.stats = fb_game.stats
 
         # Font settings for scoring information
-        self.font = pygame.font.Font(self.settings.activescore_font_path, self.settings.activescore_font_size)
+        self.texts = fb_game.texts
         self.color = self.settings.activescore_color
 
         # Prepare the initial score images.
@@ -285,7 +390,8 @@ class Scoreboard:
 
     def prep_score(self):
         """Turn the score into a rendered image."""
-        self.image = self.font.render(str(self.stats.score), False, self.color, None)
+        self.image = self.texts.number(self.settings.activescore_font_path, self.settings.activescore_font_size,
+                                       self.stats.score, self.color)
 
     def show_score(self):
         """Draw score while game is active"""
@@ -298,26 +404,23 @@ class Ready:
         self.screen_rect = fb_game.screen_rect
 
         # a text saying FLAPPY BIRD
-        self.flappy_font = pygame.font.Font(self.settings.flappy_font_path, self.settings.flappy_font_size)
         self.flappy_text = "FLAPPY BIRD"
         self.flappy_text_color = self.settings.flappy_text_color
-        self.flappy_message_image = self.flappy_font.render(self.flappy_text, False, self.flappy_text_color, None)
+        self.flappy_message_image = fb_game.texts.text(self.settings.flappy_font_path, self.settings.flappy_font_size, self.flappy_text, self.flappy_text_color)
         self.flappy_message_rect = self.flappy_message_image.get_rect()
         self.flappy_message_rect.center = (self.screen_rect.centerx, self.screen_rect.height // 4)
 
         # a text saying GET READY!
-        self.getready_font = pygame.font.Font(self.settings.getready_font_path, self.settings.getready_font_size)
         self.getready_text = "GET READY!"
         self.getready_text_color = self.settings.getready_text_color
-        self.getready_message_image = self.getready_font.render(self.getready_text, False, self.getready_text_color, None) 
+        self.getready_message_image = fb_game.texts.text(self.settings.getready_font_path, self.settings.getready_font_size, self.getready_text, self.getready_text_color)
         self.getready_message_rect = self.getready_message_image.get_rect()
         self.getready_message_rect.center = (self.screen_rect.centerx, self.screen_rect.height // 4 * 2)
 
         # a text saying press space to play 
-        self.press_font = pygame.font.Font(self.settings.press_font_path, self.settings.press_font_size)
         self.press_text = "press space to play"
         self.press_text_color = self.settings.press_text_color
-        self.press_message_image = self.press_font.render(self.press_text, False, self.press_text_color, None) 
+        self.press_message_image = fb_game.texts.text(self.settings.press_font_path, self.settings.press_font_size, self.press_text, self.press_text_color)
         self.press_message_rect = self.press_message_image.get_rect()
         self.press_message_rect.center = (self.screen_rect.centerx, self.screen_rect.height // 4 * 3)
 
@@ -332,50 +435,65 @@ class Ready:
 class Pipe(Sprite):
     """A class to represent a single pipe."""
 
-    def __init__(self, fb_game):
-        """Initialize the pipe and set its starting position."""
+    def __init__(self, fb_game, pair):
+        """Initialize the pipe for one side of an engine pipe pair."""
         super().__init__()
         self.screen = fb_game.screen
         self.settings = fb_game.settings
         self.screen_rect = fb_game.screen_rect
-
-        # store the pipe's exact horizontal position
-        self.x = float(self.screen_rect.width)
+        self.scale = fb_game.scale
+        self.pair = pair
+        self.previous_left = None
 
     def update(self):
-        self.distance_moved = self.settings.time_passed_seconds * self.settings.pipe_speed
-        self.x -= self.distance_moved
-        if self.x <= -self.rect.width:
-            self.kill()
-        self.rect.x = self.x
+        if self.pair.active:
+            self.rect.x = scaled(self.pair.left, self.scale)
+            self.align()
+        else:
+            # Park the pipe off the screen until the engine reuses its pair
+            self.rect.left = self.screen_rect.right
+
+    def remember(self):
+        """Keep the pair's position from before the next step."""
+        self.previous_left = self.pair.left if self.pair.active else None
+
+    def interpolate(self, alpha):
+        """Draw the pipe alpha of the way from its remembered position to the current one."""
+        # A pair that was reused jumped back to the right; it is drawn where it is now
+        if self.pair.active and self.previous_left is not None and self.previous_left >= self.pair.left:
+            self.rect.x = scaled(self.previous_left + (self.pair.left - self.previous_left) * alpha, self.scale)
 
 class DownPipe(Pipe):
     """A pipe that is facing downwards."""
 
-    def __init__(self, fb_game):
-        super(DownPipe, self).__init__(fb_game)
+    def __init__(self, fb_game, pair):
+        super(DownPipe, self).__init__(fb_game, pair)
 
         # Load the pipe image and set its rect attribute.
-        self.image = pygame.image.load("downpipe.png").convert_alpha()
+        self.image = fb_game.assets.image("downpipe.png")
         self.rect = self.image.get_rect()
-        
-        # Start each new pipe outside, "next" to the screen.
-        self.rect.x = self.screen_rect.width
+
+        self.update()
+
+    def align(self):
+        """Hang the pipe down to the top of the pair's gap."""
+        self.rect.bottom = scaled(self.pair.top, self.scale)
 
 class UpPipe(Pipe):
     """A pipe that is facing upwards."""
 
-    def __init__(self, fb_game):
-        super(UpPipe, self).__init__(fb_game)
+    def __init__(self, fb_game, pair):
+        super(UpPipe, self).__init__(fb_game, pair)
 
         # Load the pipe image and set its rect attribute.
-        self.image = pygame.image.load("uppipe.png").convert_alpha()
+        self.image = fb_game.assets.image("uppipe.png")
         self.rect = self.image.get_rect()
 
-        # Start each new pipe outside, "next" to the screen.
-        self.rect.x = self.screen_rect.width
-        self.latest = True
-        self.scored = False
+        self.update()
+
+    def align(self):
+        """Stand the pipe up from the bottom of the pair's gap."""
+        self.rect.top = scaled(self.pair.bottom, self.scale)
 
 class Over:
     def __init__(self, fb_game):
@@ -383,15 +501,15 @@ class Over:
         self.screen = fb_game.screen
         self.screen_rect = fb_game.screen_rect
         self.stats = fb_game.stats
+        self.scores = fb_game.scores
+        self.texts = fb_game.texts
 
         # game over text
-        self.gameover_font = pygame.font.Font(self.settings.gameover_font_path, self.settings.gameover_font_size)
         self.gameover_text = "GAME OVER"
-        self.gameover_text_image = self.gameover_font.render(self.gameover_text, False, self.settings.gameover_text_color, None)
+        self.gameover_text_image = self.texts.text(self.settings.gameover_font_path, self.settings.gameover_font_size,
+                                                   self.gameover_text, self.settings.gameover_text_color)
         self.gameover_text_rect = self.gameover_text_image.get_rect()
 
-        self.score_font = pygame.font.Font(self.settings.score_font_path, self.settings.score_font_size)
-        self.highscore_font = pygame.font.Font(self.settings.highscore_font_path, self.settings.highscore_font_size)
         self.prep_highscore()
         self.prep_score()
 
@@ -408,7 +526,8 @@ class Over:
         self.score_rect.center = self.screen_rect.center
 
         # border
-        self.border_rect = pygame.Rect((0, 0), (self.score_rect.width + self.settings.border_width, self.score_rect.height + self.settings.border_width))
+        border_width = scaled(self.settings.border_width, fb_game.scale)
+        self.border_rect = pygame.Rect((0, 0), (self.score_rect.width + border_width, self.score_rect.height + border_width))
         self.border_rect.center = self.score_rect.center
 
     def show_score(self):
@@ -422,203 +541,576 @@ class Over:
     def prep_score(self):
         """Turn the score into a rendered image."""
         self.score_text = f"Score: {self.stats.score}"
-        self.score_text_image = self.score_font.render(self.score_text, False, self.settings.score_text_color, None)
+        self.score_text_image = self.texts.number(self.settings.score_font_path, self.settings.score_font_size,
+                                                  self.stats.score, self.settings.score_text_color, "Score: ")
 
     def prep_highscore(self):
         """Turn the highscore into a rendered image."""
-        # find the stored highscore
-        with open("highscore.txt", "r") as infile:
-            highscore = int(infile.read())
-        if highscore< self.stats.score:
-            with open("highscore.txt", "w") as outfile:
-                outfile.write(str(self.stats.score))
-            highscore = self.stats.score
+        highscore = self.scores.highscore
         self.highscore_text = f"Highscore: {highscore}"
-        self.highscore_text_image = self.highscore_font.render(self.highscore_text, False, self.settings.highscore_text_color, None)
+        self.highscore_text_image = self.texts.number(self.settings.highscore_font_path, self.settings.highscore_font_size,
+                                                      highscore, self.settings.highscore_text_color, "Highscore: ")
 
-class FlappyBird:
-    def __init__(self):
-        pygame.init()
-        self.settings = Settings()
+class ProfilerOverlay:
+    """Frame timings from the profiler drawn in the top left corner."""
+
+    def __init__(self, fb_game):
+        self.settings = fb_game.settings
+        self.screen = fb_game.screen
+        self.profiler = fb_game.profiler
+        self.fb_game = fb_game
+        self.font = fb_game.assets.font(None, self.settings.overlay_font_size)
+        self.visible = False
+
+        self.images = []
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.last_refresh = 0.0
+
+    def toggle(self):
+        """Show or hide the overlay, turning on profiling when it is shown."""
+        self.visible = not self.visible
+        if self.visible:
+            self.profiler.enabled = True
+            self.last_refresh = 0.0
+
+    def show(self):
+        """Draw the overlay, re-rendering its text a few times per second."""
+        now = time.perf_counter()
+        if now - self.last_refresh >= self.settings.overlay_refresh_seconds:
+            self.last_refresh = now
+            lines = self.profiler.summary() + [self.fb_game.pool_report(), self.fb_game.texts.report(),
+                                               self.fb_game.startup_report(), self.fb_game.sounds.report(),
+                                               self.fb_game.pacer.report(), self.fb_game.input.report()]
+            if self.fb_game.population:
+                lines.append(self.fb_game.population.report())
+            self.images = [self.font.render(line, True, self.settings.overlay_text_color, self.settings.overlay_background_color)
+                           for line in lines]
+            self.rect = pygame.Rect(0, 0, max(image.get_width() for image in self.images),
+                                    sum(image.get_height() for image in self.images))
+        y = 0
+        for image in self.images:
+            self.screen.blit(image, (0, y))
+            y += image.get_height()
 
-        self.screen = pygame.display.set_mode((self.settings.screen_width, self.settings.screen_height), self.settings.screen_flags, self.settings.screen_depth)
+class FlappyBird:
+    def __init__(self, settings=None):
+        self.started = time.perf_counter()
+        # Only what the screens need starts here; the mixer and the sounds
+        # are loaded behind the first frames
+        pygame.display.init()
+        pygame.font.init()
+        self.settings = settings if settings is not None else Settings()
+
+        # The engine plays in screen_width x screen_height units; the window
+        # and every image are render_scale times that size
+        self.scale = self.settings.render_scale
+        size = (scaled(self.settings.screen_width, self.scale), scaled(self.settings.screen_height, self.scale))
+        self.screen = None
+        if self.settings.pacing_mode == "vsync":
+            # pygame only syncs scaled or OpenGL windows to the refresh
+            try:
+                self.screen = pygame.display.set_mode(size, self.settings.screen_flags | SCALED, self.settings.screen_depth, vsync=1)
+            except pygame.error:
+                pass
+        if self.screen is None:
+            self.screen = pygame.display.set_mode(size, self.settings.screen_flags, self.settings.screen_depth)
         self.screen_rect = self.screen.get_rect()
         pygame.display.set_caption("FLAPPY BIRD!")
+        self.assets = Assets(self.scale, open_pack(self.settings.asset_pack_path))
+        self.texts = TextCache(self.assets)
+        self._measure_sprites()
+
+        # The simulation; everything below only draws and plays what it reports
+        self.engine = Engine(self.settings)
+        self.stats = self.engine.stats
+        self.flap_requested = False
+        # When the key behind flap_requested went down, None for flaps that did not come from a key
+        self.flap_time = None
+
+        # The highscore and the game log, saved off the frame thread
+        self.scores = ScoreStore(self.settings.highscore_path, self.settings.stats_path)
 
         # Game elements
+        self.pool_counts = {"pipe sprites created": 0, "ground tiles created": 0, "ground tiles reused": 0}
         self.bird = Bird(self)
         self.pipes = pygame.sprite.Group()
-        self._create_pipe_pair()
+        self.pipe_sprites = {}
+        self._update_pipes()
         self.grounds = pygame.sprite.Group()
+        self.ground_tiles = deque()
         self._create_grounds()
-        self.stats = GameStats(self)
         self.scoreboard = Scoreboard(self)
         self.ready = Ready(self)
         self.moving_background = MovingBackground(self)
         self.over = Over(self)
         self._initialize_sounds()
 
-        self.clock = pygame.time.Clock()
+        self.pacer = Pacer(self.settings)
+        self.input = InputQueue(self.settings)
+        self.pacer.poll = self.input.poll
+
+        # What the dirty-rect renderer drew last frame
+        self.render_stats = RenderStats(self.screen_rect)
+        self.drawn_rects = []
+        self.drawn_status = None
+        self.drawn_background = None
+
+        # Frame timings, recorded once profiling is turned on
+        self.profiler = FrameProfiler(PROFILE_PHASES, self.settings.profile_frames, enabled=False)
+        self.profile_path = None
+        self.overlay = ProfilerOverlay(self)
+
+        # Frames saved by capture.FrameCapture after they are drawn
+        self.capture = None
+
+        # Population mode: many birds on the course instead of the player's
+        self.population = None
+        self.flock = None
+
+        # Replay recording and playback
+        self.recorder = None
+        self.player = None
+        self.replay_dt = 0
+
+        # Seconds from the start of __init__ until the first frame was on the screen
+        self.first_frame_seconds = None
+
+    def record(self, path):
+        """Start a new seeded game and write every frame of it to a replay file."""
+        seed = new_seed()
+        self.engine.reset(seed)
+        self._sync_after_jump()
+        self.recorder = ReplayWriter(path, seed, self.settings, self.settings.replay_snapshot_interval)
+
+    def replay(self, reader, seconds=None):
+        """Play back a replay instead of reading the keyboard, optionally from a game time."""
+        self.player = reader.player(self.engine)
+        if seconds:
+            self.player.seek(seconds=seconds)
+        self._sync_after_jump()
+
+    def populate(self, size, policy=None):
+        """Fly a population of birds through the course instead of the player's bird.
+
+        The jump key starts the population and restarts it once every bird
+        crashed; in between the policy flaps the birds. Returns the
+        population.Population.
+        """
+        # NumPy is only needed in population mode
+        from population import Population, Flock
+        self.population = Population(size, self.engine, policy)
+        self.flock = Flock(self, self.population)
+        self._sync_after_jump()
+        return self.population
+
+    def _sync_after_jump(self):
+        """Bring the sprites and texts up to date after the engine state was replaced."""
+        self.bird.update()
+        if self.flock:
+            self.flock.update()
+        self._update_pipes()
+        self.scoreboard.prep_score()
+        if self.stats.game_status == OVER:
+            self.over.prep_score()
 
     def run_game(self):
         """Start main loop for the game."""
         while True:
-            self.settings.time_passed_seconds = self.clock.tick() / 1000
-            self._check_events()
-
-            if self.stats.game_status == ACTIVE:
-                self.settings.active_time += self.settings.time_passed_seconds
-                self.bird.update()
-                self._update_pipes()
-                self._update_grounds()
-                self.moving_background.update()
-            elif self.stats.game_status == OVER:
-                self.bird.lose_fall()
-                # display scoreboard
-            elif self.stats.game_status == READY:
-                self._update_grounds()
-                self.moving_background.update()
-                self.bird.float()
-                pass
-
-            self._update_screen()
+            self._run_frame()
+
+    def _run_frame(self):
+        """Wait for the next frame, then play and draw it."""
+        self.profiler.begin()
+        # A replay plays back at the speed it was recorded
+        self.settings.time_passed_seconds = self.pacer.tick(1 / self.replay_dt if self.replay_dt else 0)
+        self.profiler.lap("clock.tick")
+        self._check_events()
+        self.profiler.lap("_check_events")
+        if self.pacer.fixed and not self.player:
+            self._update_fixed()
+        else:
+            self._update_frame()
+        self._update_screen()
+        self.profiler.end()
+
+    def _update_fixed(self):
+        """Advance the engine by whole time steps and draw the sprites in between their last two."""
+        frame_seconds = self.settings.time_passed_seconds
+        steps = self.pacer.steps(frame_seconds)
+        # Each step covers a slice of the time since the last frame's steps;
+        # a key flaps in the step whose slice it went down in, and one
+        # pressed after the last slice waits for the next frame
+        start = self.pacer.frame_time - self.pacer.accumulator - steps * self.settings.time_step
+        for step in range(steps):
+            self.bird.remember()
+            if self.flock:
+                self.flock.remember()
+            for pipe in self.pipes:
+                pipe.remember()
+            self.settings.time_passed_seconds = self.settings.time_step
+            end = start + self.settings.time_step
+            self._update_frame(scenery=False, start=start, end=end)
+            start = end
+
+        # The ground and the background only decorate; they move by the real frame time
+        self.settings.time_passed_seconds = frame_seconds
+        self._update_scenery()
+        alpha = self.pacer.alpha
+        self.bird.interpolate(alpha)
+        if self.flock:
+            self.flock.interpolate(alpha)
+        for pipe in self.pipes:
+            pipe.interpolate(alpha)
+
+    def _update_frame(self, scenery=True, start=None, end=None):
+        """Advance the engine by this frame's time and move the sprites to match.
+
+        :param scenery: move the ground and the background too
+        :param start: perf_counter time the step starts at, by default
+            this frame's time before the frame began
+        :param end: perf_counter time the step ends at; a key pressed at or
+            after it is kept for a later step
+        Returns False without stepping if a replay just ran out of frames.
+        """
+        at = 0.0
+        if self.player:
+            frame = self.player.next_frame()
+            if frame is None:
+                # The replay is over; hand the game back to the keyboard
+                # from the next frame on, since this one has nothing to play
+                self.player = None
+                self.replay_dt = 0
+                return False
+            else:
+                self.flap_requested, self.settings.time_passed_seconds, at = frame
+                self.replay_dt = self.settings.time_passed_seconds
+        flap = self.flap_requested
+        if not self.player and flap and self.flap_time is not None:
+            # The step catches the game up to now; flap when the key went down
+            dt = self.settings.time_passed_seconds
+            if start is None:
+                start = self.pacer.frame_time - dt
+            if end is not None and self.flap_time >= end:
+                flap = False
+            else:
+                at = min(max(self.flap_time - start, 0.0), dt)
+        if self.recorder:
+            self.recorder.frame(flap, self.settings.time_passed_seconds, at)
+
+        if self.population:
+            events = self.population.step(flap, self.settings.time_passed_seconds)
+        else:
+            events = self.engine.step(flap, self.settings.time_passed_seconds, at)
+        if flap:
+            if self.flap_time is not None:
+                self.input.flapped(self.flap_time)
+            self.flap_requested = False
+            self.flap_time = None
+        if self.recorder and self.recorder.snapshot_due():
+            self.recorder.snapshot(self.engine)
+        self._handle_engine_events(events)
+        self.sounds.update()
+        self.profiler.lap("engine.step")
+
+        self.bird.update()
+        if self.flock:
+            self.flock.update()
+        self.profiler.lap("bird.update")
+        self._update_pipes()
+        self.profiler.lap("_update_pipes")
+        if scenery:
+            self._update_scenery()
+        return True
+
+    def _update_scenery(self):
+        """Scroll the ground and the background by this frame's time."""
+        if self.stats.game_status != OVER:
+            self._update_grounds()
+            self.profiler.lap("_update_grounds")
+            self.moving_background.update()
+            self.profiler.lap("moving_background.update")
+
+    def _measure_sprites(self):
+        """Give the engine hitboxes that match the images at their own size."""
+        self.settings.bird_width, self.settings.bird_height = self.assets.image("bird.png", scale=1).get_size()
+        self.settings.pipe_width, self.settings.pipe_height = self.assets.image("downpipe.png", scale=1).get_size()
+        self.settings.ground_tile_height = self.assets.image("ground.png", scale=1).get_height()
 
     def _initialize_sounds(self):
-        pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512, devicename=None, allowedchanges=AUDIO_ALLOW_FREQUENCY_CHANGE | AUDIO_ALLOW_CHANNELS_CHANGE)
-        self.die_sound = pygame.mixer.Sound("die.ogg")
-        self.hit_sound = pygame.mixer.Sound("hit.ogg")
-        self.point_sound = pygame.mixer.Sound("point.ogg")
-        self.wing_sound = pygame.mixer.Sound("wing.ogg")
+        """Open the mixer and load the sounds in the background."""
+        self.sounds = SoundManager(self.assets, self.settings)
+        self.assets.preload(self.sounds.paths(), before=self.sounds.open_mixer)
 
     def _check_events(self):
-        for event in pygame.event.get():
+        self.input.poll()
+        for pressed, event in self.input.take():
             if event.type == QUIT:
-                pygame.quit()
-                exit()
+                self._quit()
             elif event.type == KEYDOWN:
-                self._check_keydown_events(event)
-    def _check_keydown_events(self, event):
+                self._check_keydown_events(event, pressed)
+    def _check_keydown_events(self, event, pressed=None):
         if event.key == K_SPACE:
-            if self.stats.game_status == ACTIVE:
-                self.bird.jump()
-                self.wing_sound.play()
-            elif self.stats.game_status == READY:
-                self.stats.game_status = ACTIVE
-                self.bird.jump()
-                self.wing_sound.play()
-            elif self.stats.game_status == OVER:
-                self.stats.game_status = READY
-                self.settings.initialize_dynamic_settings()
-                self.stats.reset_stats()
-                self.pipes.empty()
-                self.scoreboard.prep_score()
-                self._create_pipe_pair()
-                self.bird.rect.center = (self.screen_rect.centerx // 2, self.screen_rect.centery)
-                self.bird.y = float(self.bird.rect.y)
-                self.bird.rotation_angle = 0
-                self.settings.bird_jumping_velocity = self.settings.bird_initial_jumping_velocity
-                self.bird.rotation_angle = 0
-                self.bird.previous_rotation_angle = 0
-                self.bird.image = pygame.transform.rotate(self.bird.original_image, self.bird.rotation_angle)
+            # The engine decides whether this jumps, starts or restarts the game;
+            # a second press before it ran counts from the first
+            if not self.flap_requested:
+                self.flap_time = pressed
+            self.flap_requested = True
+
+        elif event.key == K_F3:
+            self.overlay.toggle()
 
         elif event.key == K_q:
-            pygame.quit()
-            exit()
+            self._quit()
+
+    def _quit(self):
+        """Write the profile if one was asked for, finish saving scores, then leave the game."""
+        if self.profile_path:
+            self.profiler.dump(self.profile_path)
+        self.profiler.close()
+        if self.recorder:
+            self.recorder.close()
+        if self.capture:
+            self.capture.close()
+        self.scores.close()
+        self.assets.wait()
+        pygame.quit()
+        exit()
+
+    def _handle_engine_events(self, events):
+        """Play the sounds and refresh the texts for what happened in the engine."""
+        for event in events:
+            if event == WING:
+                self.sounds.play("wing")
+            elif event == POINT:
+                self.sounds.play("point")
+                self.scoreboard.prep_score()
+            elif event == HIT:
+                self._bird_hit()
+            elif event == DIE:
+                self.sounds.play("die")
+            elif event == RESET:
+                self.scoreboard.prep_score()
+                # Nothing to draw in between a lost game and the new one
+                self.bird.remember()
+                if self.flock:
+                    self.flock.remember()
 
     def _update_pipes(self):
-        if self.settings.active_time < 2:
-            return
+        """Move the pipe sprites to their engine pipe pairs.
 
+        The engine reuses its pipe pairs, so every pair gets its two sprites
+        once and keeps them; sprites of pooled pairs wait off the screen.
+        """
+        for pair in self.engine.pipes:
+            if pair not in self.pipe_sprites:
+                self.pipe_sprites[pair] = (DownPipe(self, pair), UpPipe(self, pair))
+                self.pipes.add(self.pipe_sprites[pair])
+                self.pool_counts["pipe sprites created"] += 2
         self.pipes.update()
-        pipes = self.pipes.sprites()
-        last_pipe = pipes[-1]
-        if last_pipe.rect.left <= self.settings.pipe_distance and last_pipe.latest:
-            self._create_pipe_pair()
-            last_pipe.latest = False
-
-        # Check bird and pipes collisions
-        if pygame.sprite.spritecollideany(self.bird, self.pipes):
-            self._bird_hit()
-            self.die_sound.play()
-            self.bird.isjump = False
-            self.settings.bird_velocity = self.settings.bird_initial_velocity
-            self.settings.bird_jumping_velocity = self.settings.bird_initial_jumping_velocity
-            self.settings.bird_jumping_height = 0
-            self.bird.previous_rotation_angle = abs(self.bird.rotation_angle)
-            return
-
-        # Check if bird crossed the pipe
-        for pipe in range(1, len(pipes), 2):
-            pipe = pipes[pipe]
-            if pipe.rect.left <= self.bird.rect.left and not pipe.scored:
-                pipe.scored = True
-                self.point_sound.play()
-                self.stats.score += 1
-                self.scoreboard.prep_score()
 
-    def _create_pipe(self, direction, y):
-        """Create a pipe and set its direction and position.
-
-        :param direction: -1 if down and 1 if up
-        :type direction: int
-        """
-        if direction == -1:
-            pipe = DownPipe(self)
-            pipe.rect.bottom = y
-        elif direction == 1:
-            pipe = UpPipe(self)
-            pipe.rect.top = y
-        else:
-            return
-        self.pipes.add(pipe)
+    def startup_report(self):
+        """Return how long the first frame and the background loads took."""
+        first_frame = "-" if self.first_frame_seconds is None else f"{self.first_frame_seconds * 1000:.1f} ms"
+        preload = self.assets.preload_seconds
+        return f"first frame {first_frame}, background loads " + ("running" if preload is None else f"{preload * 1000:.1f} ms")
 
-    def _create_pipe_pair(self):
-        """Create the pipe pair: One facing down and one facing up."""
-        random_height = random.randint(self.settings.pipe_min_top, self.settings.pipe_max_top)
-        self._create_pipe(-1, random_height)
-        self._create_pipe(1, random_height + self.settings.pipe_space)
+    def pool_report(self):
+        """Return how many pipes and ground tiles were created and how many reused."""
+        return (f"pipes {self.engine.pipes_created} created / {self.engine.pipes_reused} reused, "
+                f"pipe sprites {self.pool_counts['pipe sprites created']} created, "
+                f"ground tiles {self.pool_counts['ground tiles created']} created / "
+                f"{self.pool_counts['ground tiles reused']} reused")
 
     def _bird_hit(self):
         """Sending "bird dead" statuses to elements."""
-        self.stats.game_status = OVER
+        self.scores.record_game(self.stats.score, self.engine.frame, self.engine.active_time, self.engine.seed)
         self.over.prep_score()
         self.over.prep_highscore()
-        self.hit_sound.play()
+        self.sounds.play("hit")
 
     def _update_grounds(self):
         self.grounds.update()
-        last_ground = self.grounds.sprites()[-1]
+        last_ground = self.ground_tiles[-1]
         if last_ground.rect.right <= self.screen_rect.width:
-            ground = Ground(self)
+            # Move the tile that left the screen to the end instead of making a new one
+            if self.ground_tiles[0].offscreen():
+                ground = self.ground_tiles.popleft()
+                self.pool_counts["ground tiles reused"] += 1
+            else:
+                ground = Ground(self)
+                self.grounds.add(ground)
+                self.pool_counts["ground tiles created"] += 1
             ground.rect.bottomleft = last_ground.rect.bottomright
             ground.x = float(ground.rect.x)
-            self.grounds.add(ground)
-
-        # check if bird hits ground
-        if pygame.sprite.spritecollideany(self.bird, self.grounds):
-            self._bird_hit()
+            self.ground_tiles.append(ground)
 
     def _create_grounds(self):
-        for x in range(self.screen_rect.width // Ground(self).rect.width + 1):
+        ground_width = self.assets.image("ground.png").get_width()
+        for x in range(self.screen_rect.width // ground_width + 1):
             ground = Ground(self)
             ground.rect.x = x * ground.rect.width
             ground.x = ground.rect.x
             self.grounds.add(ground)
+            self.ground_tiles.append(ground)
+            self.pool_counts["ground tiles created"] += 1
 
     def _update_screen(self):
         """Update images on the screen, and update to the new screen."""
-        self.moving_background.blitme()
+        start = time.perf_counter()
+        if self.settings.render_mode == "dirty":
+            dirty = self._draw_dirty()
+        else:
+            self.moving_background.blitme()
+            self._draw_sprites()
+            dirty = None
+        self.profiler.lap("_update_screen")
+
+        if dirty is None:
+            pygame.display.update()
+            pixels = self.render_stats.screen_pixels
+        else:
+            pygame.display.update(dirty)
+            pixels = sum(rect.width * rect.height for rect in dirty)
+        self.profiler.lap("display.update")
+        self.input.presented()
+        if self.capture:
+            self.capture.frame(self.screen)
+        self.render_stats.add(time.perf_counter() - start, pixels)
+        if self.first_frame_seconds is None:
+            self.first_frame_seconds = time.perf_counter() - self.started
+
+    def _draw_dirty(self):
+        """Redraw only the parts of the screen that changed.
+
+        Returns the rects that need to be sent to the display.
+        """
+        drawn = self._moving_rects()
+        status = self.stats.game_status
+        background = self.moving_background.rect.topleft
+        if status != self.drawn_status or background != self.drawn_background:
+            # Text changed or the background scrolled: nothing can be reused
+            self.moving_background.blit_strip()
+            self._draw_sprites()
+            dirty = [self.screen_rect]
+        else:
+            dirty = self._merge_rects(self.drawn_rects + drawn)
+            for rect in dirty:
+                self.screen.set_clip(rect)
+                self.moving_background.blit_strip()
+                self._draw_sprites()
+            self.screen.set_clip(None)
+
+        self.drawn_rects = drawn
+        self.drawn_status = status
+        self.drawn_background = background
+        return dirty
+
+    def _moving_rects(self):
+        """Rects of everything on the screen that can move between frames."""
+        if self.flock:
+            rects = [self.flock.rect.copy()]
+        else:
+            rects = [self.bird.image.get_rect(topleft=self.bird.rect.move(self.bird.image_offset).topleft)]
+        rects.extend(pipe.rect.copy() for pipe in self.pipes)
+        if self.stats.game_status != OVER:
+            ground = self.ground_tiles[0].rect
+            rects.append(pygame.Rect(0, ground.y, self.screen_rect.width, ground.height))
+        if self.stats.game_status == ACTIVE:
+            rects.append(self.scoreboard.image.get_rect(topleft=self.scoreboard.rect.topleft))
+        if self.overlay.visible:
+            rects.append(self.overlay.rect.copy())
+        return rects
+
+    def _merge_rects(self, rects):
+        """Clip rects to the screen and union the ones that overlap."""
+        merged = []
+        for rect in rects:
+            rect = rect.clip(self.screen_rect)
+            if not rect.width or not rect.height:
+                continue
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def _draw_sprites(self):
+        """Draw everything in front of the background."""
         self.pipes.draw(self.screen)
         self.grounds.draw(self.screen)
-        self.bird.blitme()
+        if self.flock:
+            self.flock.blitme()
+        else:
+            self.bird.blitme()
         if self.stats.game_status == READY:
             self.ready.show_messages()
         elif self.stats.game_status == OVER:
             self.over.show_score()
         elif self.stats.game_status == ACTIVE:
             self.scoreboard.show_score()
-        pygame.display.update()
+        if self.overlay.visible:
+            self.overlay.show()
+
+def compare_render_modes(frames=600, seed=0):
+    """Play the same scripted game with each render mode and report the stats."""
+    reports = {}
+    for mode in ("full", "dirty"):
+        # Scripted games are not the player's; they must not reach the highscore or the stats log
+        fb_game = FlappyBird(Settings().override(highscore_path=None, stats_path=None, render_mode=mode))
+        fb_game.engine.reset(seed)
+        for frame in range(frames):
+            fb_game.settings.time_passed_seconds = fb_game.settings.time_step
+            fb_game.flap_requested = frame % 24 == 0
+            fb_game._update_frame()
+            fb_game._update_screen()
+        reports[mode] = fb_game.render_stats.report()
+    return reports
 
 if __name__ == "__main__":
-    fb_game = FlappyBird()
+    parser = argparse.ArgumentParser(description="Play Flappy Bird.")
+    parser.add_argument("--render", choices=("full", "dirty"), help="redraw the whole screen or only what changed")
+    parser.add_argument("--scale", type=float, help="window size relative to the game's, like 0.5 for slow devices")
+    parser.add_argument("--pacing", choices=("uncapped", "capped", "vsync", "fixed"), help="how frames are paced, see pacing.py")
+    parser.add_argument("--fps", type=int, help="frame rate of the capped and fixed pacing")
+    parser.add_argument("--collision", choices=("rect", "mask"), help="test the bird's rect or its pixels against the pipes")
+    parser.add_argument("--compare-render", action="store_true", help="time both render modes on a scripted game and exit")
+    parser.add_argument("--profile", metavar="PATH", help="record frame timings and write them to a .csv or .json file on exit")
+    parser.add_argument("--record", metavar="PATH", help="write the game to a replay file")
+    parser.add_argument("--replay", metavar="PATH", help="play back a replay file")
+    parser.add_argument("--capture", metavar="PATH", help="save every frame to a PNG directory or a .rgb raw video file")
+    parser.add_argument("--seek", type=float, metavar="SECONDS", help="start the replay this many seconds in")
+    args = parser.parse_args()
+
+    if args.compare_render:
+        for mode, report in compare_render_modes().items():
+            print(f"{mode}: {report}")
+        exit()
+
+    if args.replay:
+        reader = ReplayReader(args.replay)
+        fb_game = FlappyBird(reader.settings)
+        fb_game.replay(reader, args.seek)
+    else:
+        settings = Settings()
+        if args.collision:
+            settings.collision_mode = args.collision
+        if args.scale:
+            settings.render_scale = args.scale
+        if args.pacing:
+            settings.pacing_mode = args.pacing
+        if args.fps:
+            settings.max_fps = args.fps
+        fb_game = FlappyBird(settings)
+    if args.record:
+        fb_game.record(args.record)
+    if args.render:
+        fb_game.settings.render_mode = args.render
+    if args.capture:
+        from capture import FrameCapture
+        fb_game.capture = FrameCapture(args.capture, fb_game.screen.get_size(), fb_game.settings.capture_buffers,
+                                       png_level=fb_game.settings.capture_png_level)
+    if args.profile:
+        fb_game.profiler.enabled = True
+        fb_game.profile_path = args.profile
     fb_game.run_game()
@@ -0,0 +1,158 @@
+"""Pipe schedules: whole courses generated up front instead of one draw per pipe.
+
+A schedule is a NumPy structured array with one entry per pipe pair, in the
+order they appear:
+
+    top       y of the gap's top edge
+    space     height of the gap
+    distance  how far left the previous pair has to move before this one
+              spawns, like Settings.pipe_distance
+    speed     pixels per second every pair moves once this one has spawned
+
+The entries follow a difficulty curve that goes from the easy end to the
+hard end over a number of pipes, so difficulty rises with the score. Every
+gap can be reached from the one before with the bird's jump physics, see
+infeasible. Schedules are saved as .npy files and opened memory-mapped, so
+any number of engines, processes and episodes can play the same course
+while the file is read only once.
+
+    python levels.py course.npy --pipes 100000 --seed 1     generate and check a course
+"""
+import argparse
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from settings import Settings
+
+PIPE_DTYPE = np.dtype([("top", "<i4"), ("space", "<i4"), ("distance", "<i4"), ("speed", "<f8")])
+
+# Values at the easy and the hard end of a difficulty curve, and how many
+# pipes it takes to get from one to the other
+Curve = namedtuple("Curve", "space distance speed pipes")
+
+def default_curve(settings):
+    """Start at the game's usual difficulty and end with smaller, closer and faster pipes."""
+    return Curve(space=(settings.pipe_space, settings.pipe_space * 3 // 4),
+                 distance=(settings.pipe_distance, settings.pipe_distance + 60),
+                 speed=(settings.pipe_speed, settings.pipe_speed * 1.5),
+                 pipes=100)
+
+def ramp(curve, count):
+    """Return how far along the curve each of count pipes is, from 0.0 to 1.0."""
+    return np.minimum(np.arange(count) / max(curve.pipes, 1), 1.0)
+
+def generate(count, settings=None, seed=None, curve=None):
+    """Generate a feasible schedule of count pipe pairs.
+
+    The gaps are drawn in bulk; a draw that the bird could not reach from
+    the previous gap is then moved to the nearest reachable height.
+    """
+    settings = settings if settings is not None else Settings()
+    curve = curve if curve is not None else default_curve(settings)
+    rng = np.random.default_rng(seed)
+
+    schedule = np.zeros(count, dtype=PIPE_DTYPE)
+    progress = ramp(curve, count)
+    schedule["space"] = np.rint(np.interp(progress, (0, 1), curve.space))
+    schedule["distance"] = np.rint(np.interp(progress, (0, 1), curve.distance))
+    schedule["speed"] = np.interp(progress, (0, 1), curve.speed)
+
+    # Same range as Engine._draw_pipe_height, for each pair's own gap
+    max_tops = settings.ground_height - settings.pipe_initial_height - schedule["space"]
+    schedule["top"] = rng.integers(settings.pipe_min_top, max_tops, endpoint=True)
+
+    # Each gap depends on the one before, so this pass runs on plain lists
+    tops = schedule["top"].tolist()
+    spaces = schedule["space"].tolist()
+    distances = schedule["distance"].tolist()
+    speeds = schedule["speed"].tolist()
+    for index in range(1, count):
+        low, high = reachable(tops[index - 1], spaces[index - 1], spaces[index], distances[index], speeds[index], settings)
+        tops[index] = min(max(tops[index], low), high)
+    schedule["top"] = tops
+    return schedule
+
+def _rise(seconds, settings):
+    """How far the bird climbs in some seconds, flapping each time a jump ends."""
+    jump_seconds = settings.bird_initial_jumping_velocity / settings.bird_gravity
+    return settings.bird_max_jumping_height * seconds / jump_seconds
+
+def _fall(seconds, settings):
+    """How far the bird drops in some seconds from a standstill."""
+    capped = settings.bird_max_velocity / settings.bird_gravity
+    if seconds <= capped:
+        return settings.bird_gravity * seconds ** 2 / 2
+    return settings.bird_gravity * capped ** 2 / 2 + settings.bird_max_velocity * (seconds - capped)
+
+def reachable(previous_top, previous_space, space, distance, speed, settings):
+    """Return the lowest and highest top of a pair that the bird can reach from the pair before.
+
+    :param distance: the pair's spawn distance, which sets how far apart the two pairs are
+    :param speed: the pair's speed
+    """
+    # Seconds the bird has between the two pairs, clear of both pipes
+    spacing = settings.screen_width - distance
+    seconds = max(spacing - settings.pipe_width - settings.bird_width, 0) / speed
+    # The bird's top can be anywhere in a gap that leaves room for its height
+    low = previous_top - _rise(seconds, settings) - (space - settings.bird_height)
+    high = previous_top + previous_space - settings.bird_height + _fall(seconds, settings)
+    low = max(math.ceil(low), settings.pipe_min_top)
+    high = min(int(high), settings.ground_height - settings.pipe_initial_height - space)
+    return low, max(low, high)
+
+def infeasible(schedule, settings=None):
+    """Return the indexes of the pairs the bird cannot pass coming from the pair before."""
+    settings = settings if settings is not None else Settings()
+    tops = schedule["top"].tolist()
+    spaces = schedule["space"].tolist()
+    distances = schedule["distance"].tolist()
+    speeds = schedule["speed"].tolist()
+    bad = []
+    for index in range(len(tops)):
+        if spaces[index] <= settings.bird_height:
+            bad.append(index)
+        elif index:
+            low, high = reachable(tops[index - 1], spaces[index - 1], spaces[index], distances[index], speeds[index], settings)
+            if not low <= tops[index] <= high:
+                bad.append(index)
+    return bad
+
+def save(path, schedule):
+    np.save(path, schedule)
+
+# Schedules opened in this process, shared by every engine that plays them
+_opened = {}
+
+def open_schedule(path):
+    """Map a saved schedule into memory, once per path and process."""
+    if path not in _opened:
+        schedule = np.load(path, mmap_mode="r")
+        if schedule.dtype != PIPE_DTYPE:
+            raise ValueError(f"{path} is not a pipe schedule")
+        _opened[path] = schedule
+    return _opened[path]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a pipe schedule and check that it can be played.")
+    parser.add_argument("path")
+    parser.add_argument("--pipes", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--ramp", type=int, default=None, metavar="PIPES", help="pipes until the hardest difficulty")
+    args = parser.parse_args()
+
+    settings = Settings()
+    curve = default_curve(settings)
+    if args.ramp is not None:
+        curve = curve._replace(pipes=args.ramp)
+    start = time.perf_counter()
+    schedule = generate(args.pipes, settings, args.seed, curve)
+    elapsed = time.perf_counter() - start
+    save(args.path, schedule)
+    bad = infeasible(open_schedule(args.path), settings)
+    print(f"{args.pipes} pipes in {elapsed:.2f} s, {len(bad)} infeasible")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Frame pacing: how long the main loop waits between frames.
+
+Settings.pacing_mode picks one of:
+
+    uncapped  draw frames as fast as the machine can, using a whole core
+    capped    wait until 1 / max_fps seconds have passed since the last frame
+    vsync     ask the display to wait for the monitor's refresh
+    fixed     like capped, but the engine only ever advances by whole
+              time_step steps; what is left over is carried to the next
+              frame and the sprites are drawn between their last two
+              positions, so the physics is the same on every machine
+
+Capped and fixed sleep between frames unless pacing_busy_loop is set;
+tick_busy_loop hits the frame time more exactly at the cost of a busy core.
+With a poll function they wait in slices of input_poll_interval and call
+it after each one, so input is picked up while the loop waits.
+The Pacer also measures how much CPU time the game used and how much the
+frame times jitter.
+
+    python pacing.py --seconds 5     play a scripted game headless in every mode and compare
+"""
+import argparse
+import os
+import statistics
+import time
+from collections import deque
+
+import pygame
+
+MODES = ("uncapped", "capped", "vsync", "fixed")
+
+class Pacer:
+    """Waits out each frame the way the pacing mode asks and keeps track of the timing."""
+
+    def __init__(self, settings):
+        if settings.pacing_mode not in MODES:
+            raise ValueError(f"unknown pacing mode: {settings.pacing_mode}")
+        self.settings = settings
+        self.mode = settings.pacing_mode
+        self.fixed = self.mode == "fixed"
+        self.clock = pygame.time.Clock()
+        self.wait = self.clock.tick_busy_loop if settings.pacing_busy_loop else self.clock.tick
+        # Called while waiting for the next frame, like InputQueue.poll
+        self.poll = None
+        # perf_counter when the current frame began
+        self.frame_time = time.perf_counter()
+
+        # Leftover seconds that did not make a whole fixed step yet
+        self.accumulator = 0.0
+        self.dropped_seconds = 0.0
+
+        # Frame times, and CPU and wall time of the same frames, for the report
+        self.frame_times = deque(maxlen=settings.pacing_samples)
+        self.cpu_times = deque(maxlen=settings.pacing_samples)
+        self._cpu = time.process_time()
+
+    def tick(self, fps=0):
+        """Wait for the next frame and return the seconds since the last one.
+
+        :param fps: frame rate that overrides the mode, like a replay's
+        """
+        if fps:
+            milliseconds = self.clock.tick(fps)
+        elif self.mode in ("capped", "fixed") and self.poll:
+            milliseconds = self._wait_polling(self.settings.max_fps)
+        elif self.mode in ("capped", "fixed"):
+            milliseconds = self.wait(self.settings.max_fps)
+        else:
+            # Uncapped, or vsync where the display update does the waiting
+            milliseconds = self.clock.tick()
+        self.frame_time = time.perf_counter()
+        cpu = time.process_time()
+        self.frame_times.append(milliseconds / 1000)
+        self.cpu_times.append(cpu - self._cpu)
+        self._cpu = cpu
+        return milliseconds / 1000
+
+    def _wait_polling(self, fps):
+        """Wait until 1 / fps seconds after the last frame began, polling in between."""
+        end = self.frame_time + 1 / fps
+        while True:
+            self.poll()
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                break
+            if not self.settings.pacing_busy_loop:
+                time.sleep(min(remaining, self.settings.input_poll_interval))
+        return self.clock.tick()
+
+    def steps(self, seconds):
+        """Add a frame's seconds to the accumulator and return how many fixed steps are due."""
+        step = self.settings.time_step
+        self.accumulator += seconds
+        steps = int(self.accumulator / step)
+        self.accumulator -= steps * step
+        if steps > self.settings.max_steps_per_frame:
+            # Too slow to catch up: drop the time instead of falling further behind
+            self.dropped_seconds += (steps - self.settings.max_steps_per_frame) * step
+            steps = self.settings.max_steps_per_frame
+        return steps
+
+    @property
+    def alpha(self):
+        """How far the accumulator is into the next step, from 0.0 to 1.0."""
+        return self.accumulator / self.settings.time_step
+
+    def cpu_usage(self):
+        """CPU time of the whole process over the wall time of the measured frames; 1.0 is a busy core."""
+        wall = sum(self.frame_times)
+        return sum(self.cpu_times) / wall if wall else 0.0
+
+    def report(self):
+        """Return the frame rate, frame time jitter and CPU usage of the last frames."""
+        if len(self.frame_times) < 2:
+            return f"pacing {self.mode}: measuring"
+        mean = statistics.fmean(self.frame_times)
+        jitter = statistics.pstdev(self.frame_times)
+        worst = max(abs(seconds - mean) for seconds in self.frame_times)
+        line = (f"pacing {self.mode}: {1 / mean if mean else 0:.0f} fps, "
+                f"frame {mean * 1000:.2f} ms +- {jitter * 1000:.2f} ms (worst {worst * 1000:.2f} ms), "
+                f"cpu {self.cpu_usage():.0%}")
+        if self.fixed:
+            line += f", {self.dropped_seconds:.2f} s dropped"
+        return line
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the CPU usage and jitter of the pacing modes.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long each mode plays")
+    parser.add_argument("--busy-loop", action="store_true", help="wait with tick_busy_loop instead of sleeping")
+    parser.add_argument("--only", action="append", choices=MODES, help="run only these modes")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import flappy_bird
+    from rollout import hover_policy
+    from settings import Settings
+
+    for mode in args.only or MODES:
+        settings = Settings().override(highscore_path=None, stats_path=None, pacing_mode=mode,
+                                       pacing_busy_loop=args.busy_loop)
+        fb_game = flappy_bird.FlappyBird(settings)
+        fb_game.engine.reset(0)
+        end = time.perf_counter() + args.seconds
+        while time.perf_counter() < end:
+            fb_game.flap_requested = hover_policy(fb_game.engine) or fb_game.stats.game_status != flappy_bird.ACTIVE
+            fb_game._run_frame()
+        print(fb_game.pacer.report())
+
+if __name__ == "__main__":
+    main()
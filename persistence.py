@@ -0,0 +1,179 @@
+"""Highscore and per-game statistics that are saved without blocking a frame.
+
+ScoreStore reads the highscore once at startup and keeps it in memory. Every
+write then happens on a background thread: the highscore file is replaced
+atomically through a temporary file, so a power cut leaves either the old
+or the new score, never a half written one. Every finished game is appended
+to a StatsLog, a file of fixed size records that can be indexed directly:
+
+    header    b"FBST", version (u8)
+    record    session start (f64), game end (f64), score (u32), frames (u32),
+              duration in seconds (f64), seed (i64, -1 when unseeded)
+
+    python persistence.py stats.bin          summarize a stats log
+"""
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = b"FBST"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sB")
+_RECORD = struct.Struct("<ddIIdq")
+
+GameRecord = namedtuple("GameRecord", "session ended score frames duration seed")
+
+def read_highscore(path):
+    """Return the highscore stored in a file, 0 if it is missing or unreadable."""
+    try:
+        with open(path, "r") as infile:
+            return int(infile.read())
+    except (OSError, ValueError):
+        return 0
+
+def write_atomic(path, data):
+    """Replace a file with new contents so it never exists half written."""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as outfile:
+        outfile.write(data)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(temporary, path)
+
+class StatsLog:
+    """An append-only file of fixed size game records."""
+
+    def __init__(self, path):
+        """Open the log, creating it if needed.
+
+        A record that a crash left half written is cut off, so the next one
+        starts at a record boundary again.
+        """
+        self.path = path
+        self.file = open(path, "a+b")
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        if size < _HEADER.size:
+            self.file.truncate(0)
+            self.file.write(_HEADER.pack(MAGIC, VERSION))
+            self.file.flush()
+            size = _HEADER.size
+        else:
+            self.file.seek(0)
+            magic, version = _HEADER.unpack(self.file.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} stats log")
+        self.count = (size - _HEADER.size) // _RECORD.size
+        self.file.truncate(_HEADER.size + self.count * _RECORD.size)
+
+    def append(self, record):
+        """Add a GameRecord at the end of the log."""
+        self.file.write(_RECORD.pack(*record))
+        self.file.flush()
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """Read one record without reading the ones before it."""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("stats log index out of range")
+        self.file.seek(_HEADER.size + index * _RECORD.size)
+        record = GameRecord(*_RECORD.unpack(self.file.read(_RECORD.size)))
+        self.file.seek(0, os.SEEK_END)
+        return record
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def close(self):
+        self.file.close()
+
+class ScoreStore:
+    """The highscore kept in memory, with the files written on a background thread."""
+
+    def __init__(self, highscore_path, stats_path=None):
+        """Read the highscore and start the writer thread.
+
+        :param highscore_path: file of the highscore, or None to keep it in memory only
+        :param stats_path: file of the game log, or None to keep no log
+        """
+        self.highscore_path = highscore_path
+        self.highscore = read_highscore(highscore_path) if highscore_path else 0
+        self.stats = StatsLog(stats_path) if stats_path else None
+        self.session = time.time()
+
+        self.writes = 0
+        self.errors = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, name="ScoreStore", daemon=True)
+        self._thread.start()
+
+    def record_game(self, score, frames=0, duration=0.0, seed=None):
+        """Count a finished game; return True if it set a new highscore.
+
+        Only memory is touched here, the files are written later.
+        """
+        record = GameRecord(self.session, time.time(), score, frames, duration, -1 if seed is None else seed)
+        new_highscore = score > self.highscore
+        if new_highscore:
+            self.highscore = score
+        self._queue.put((record, score if new_highscore else None))
+        return new_highscore
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            record, highscore = item
+            try:
+                if highscore is not None and self.highscore_path:
+                    write_atomic(self.highscore_path, str(highscore))
+                if self.stats is not None:
+                    self.stats.append(record)
+                self.writes += 1
+            except OSError as error:
+                # A full or missing disk must not take the game down
+                self.errors.append(error)
+            self._queue.task_done()
+
+    def flush(self):
+        """Wait until everything recorded so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        """Write what is still queued and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        if self.stats is not None:
+            self.stats.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a Flappy Bird stats log.")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    log = StatsLog(args.path)
+    records = list(log)
+    log.close()
+    if not records:
+        print(f"{args.path} holds no games")
+        return
+    sessions = len({record.session for record in records})
+    print(f"{len(records)} games in {sessions} sessions, best score {max(record.score for record in records)}, "
+          f"mean score {sum(record.score for record in records) / len(records):.2f}, "
+          f"{sum(record.duration for record in records) / 60:.1f} minutes played")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Population mode: thousands of birds flying through one pipe course.
+
+For neuroevolution and ghost races. A Population keeps its birds in the
+arrays of a batch_engine.BirdBatch and moves all live birds with its
+vector kernels in one go, while the pipes are those of a single Engine,
+moved once per step. Every bird shares the same left edge, so only the
+nearest pipe pair can touch any of them: it is tested against the whole
+population with array rect tests, and the birds still flying score a pair
+together when they pass it.
+
+A crashed bird only leaves the masks; nothing is freed or moved, so
+retiring birds costs nothing. The population is OVER once the last bird
+crashed, and the last ones to crash fall to the ground like the player's
+bird does.
+
+In a FlappyBird session Flock draws at most population_draw birds: the
+live birds with the lowest rank, or an even spread of them with the
+"sample" draw mode. They are blitted from the Bird sprite's cached
+rotations in a single Surface.blits call.
+
+    python population.py --birds 5000                  watch 5000 birds with spread out aims
+    python population.py --birds 5000 --draw sample    draw an even spread of the live birds instead
+    python population.py --birds 20000 --headless      measure bird steps per second without a window
+"""
+import argparse
+import time
+
+import numpy as np
+import pygame
+
+from batch_engine import BirdBatch, to_pixels
+from engine import Engine, to_pixel, READY, ACTIVE, OVER, RESET, WING, POINT, HIT
+from settings import Settings
+
+def hover_policy(population, aim=0):
+    """rollout.hover_policy for every bird at once.
+
+    :param aim: pixels below the middle of the gap each bird aims for, a number or one per bird
+    """
+    s = population.settings
+    target = s.screen_height // 2
+    for pipe in population.engine.pipes:
+        if pipe.left + pipe.width > population.bird_left:
+            target = (pipe.top + pipe.bottom) // 2 + s.bird_height // 2
+            break
+    return ~population.isjump & (population.bird_top + s.bird_height > target + aim)
+
+def spread_policy(n, spread, seed=None):
+    """Return a hover policy where each of n birds aims a random distance from the gap's middle.
+
+    Also returns the aims, so the birds that aim closest can be ranked first.
+    """
+    aims = np.random.default_rng(seed).normal(0.0, spread, n)
+    return (lambda population: hover_policy(population, aims)), aims
+
+class Population(BirdBatch):
+    """n birds that all fly through the pipe course of one Engine."""
+
+    def __init__(self, n, engine, policy=None):
+        """Create n birds READY at the start of the engine's course.
+
+        :param engine: Engine whose pipes the birds fly through; its own bird is left alone
+        :param policy: function of the population that returns which birds flap,
+            hover_policy if None
+        """
+        super().__init__(n, engine.settings)
+        self.engine = engine
+        self.policy = policy if policy is not None else hover_policy
+        # Drawing order of the live birds; the lower, the sooner one is drawn
+        self.rank = np.arange(n)
+        # The birds that crashed last, which fall once the population is OVER
+        self.last = np.zeros(n, dtype=bool)
+        self.events = []
+        self.step_seconds = 0.0
+        # A seeded engine's first course is the one its seed makes
+        self.reset(engine.seed)
+
+    def reset(self, seed=None):
+        """Start a new generation on a new course, reseeding its pipe heights if a seed is given."""
+        self.engine.reset(seed)
+        self._reset_birds(slice(None))
+        self.last[:] = False
+        self.events = [RESET]
+
+    def step(self, action=False, dt=None, actions=None):
+        """Let the birds flap, then advance them and the course by dt seconds.
+
+        :param action: the player's flap, which starts a READY population and
+            restarts one that is OVER
+        :param actions: which birds flap, asked from the policy if None
+        Returns the events that happened during the step, like Engine.step.
+        """
+        start = time.perf_counter()
+        self.events = []
+        self.points[:] = 0
+        self.hits[:] = False
+        self.flaps[:] = False
+        self.resets[:] = False
+        stats = self.engine.stats
+        if stats.game_status == READY and action:
+            stats.game_status = ACTIVE
+            self.status[:] = ACTIVE
+            self._jump(self.status == ACTIVE)
+            self.events.append(WING)
+        elif stats.game_status == OVER and action:
+            self.reset()
+        elif stats.game_status == ACTIVE:
+            actions = self.policy(self) if actions is None else np.asarray(actions, dtype=bool)
+            self._jump(actions & (self.status == ACTIVE))
+        self.advance(self.settings.time_step if dt is None else dt)
+        self.step_seconds = time.perf_counter() - start
+        return self.events
+
+    def advance(self, dt):
+        """Move the live birds and the course by dt seconds without any input."""
+        engine = self.engine
+        if engine.stats.game_status == ACTIVE:
+            active = self.status == ACTIVE
+            self.active_time[active] += dt
+            engine.active_time += dt
+            self._update_birds(active, dt)
+            if engine.active_time >= self.settings.pipe_start_time:
+                engine._move_pipes(dt)
+                self._check_pipes(active)
+            self._check_ground(active)
+            if not (self.status == ACTIVE).any():
+                self.last[:] = self.hits
+                engine.stats.game_status = OVER
+                self.events.append(HIT)
+        elif engine.stats.game_status == OVER:
+            self._lose_fall(self.last, dt)
+        self.frame += 1
+        engine.frame += 1
+
+    def _check_pipes(self, mask):
+        """Test the birds against the pairs over their column and score the pairs they passed."""
+        s = self.settings
+        engine = self.engine
+        pipes = engine.pipes
+        # Like Engine._nearby_pipes, for a column every bird shares
+        while engine.next_pipe < len(pipes) and pipes[engine.next_pipe].left + pipes[engine.next_pipe].width <= self.bird_left:
+            engine.next_pipe += 1
+        index = engine.next_pipe
+        top = self.bird_top
+        bottom = top + s.bird_height
+        while index < len(pipes) and pipes[index].left < self.bird_left + s.bird_width:
+            pipe = pipes[index]
+            hit = mask & (((top < pipe.top) & (pipe.top - pipe.height < bottom))
+                          | ((top < pipe.bottom + pipe.height) & (pipe.bottom < bottom)))
+            self.status[hit] = OVER
+            self.hits |= hit
+            self._stop(hit)
+            mask = mask & ~hit
+            index += 1
+
+        while engine.next_score < len(pipes) and pipes[engine.next_score].left <= self.bird_left:
+            pipe = pipes[engine.next_score]
+            if not pipe.scored:
+                pipe.scored = True
+                self.score[mask] += 1
+                self.points[mask] += 1
+                if mask.any():
+                    engine.stats.score += 1
+                    self.events.append(POINT)
+            engine.next_score += 1
+
+    def shown(self, count, mode="top"):
+        """Return the indices of at most count birds worth drawing.
+
+        :param mode: "top" for the live birds with the lowest rank, "sample" for an even spread of them
+        """
+        if self.engine.stats.game_status == OVER:
+            birds = np.flatnonzero(self.last)
+        else:
+            birds = np.flatnonzero(self.status != OVER)
+        if len(birds) <= count:
+            return birds
+        if mode == "sample":
+            return birds[np.linspace(0, len(birds) - 1, count).astype(np.int64)]
+        return birds[np.argpartition(self.rank[birds], count - 1)[:count]]
+
+    def report(self):
+        """Return how many birds are still flying and how long the last step took."""
+        flying = np.count_nonzero(self.status != OVER)
+        return (f"population {flying} of {self.n} flying, best score {self.engine.stats.score}, "
+                f"step {self.step_seconds * 1000:.2f} ms")
+
+class Flock:
+    """Draws the birds of a Population that are worth showing."""
+
+    def __init__(self, fb_game, population):
+        self.screen = fb_game.screen
+        self.settings = fb_game.settings
+        self.scale = fb_game.scale
+        self.population = population
+
+        # The player's sprite already rendered every rotation the birds can show
+        rotations = fb_game.bird.rotations
+        self.rotations = rotations
+        self.offsets = np.array(rotations.offsets, dtype=np.int64).reshape(-1, 2)
+        self.sizes = np.array([frame.get_size() for frame in rotations.frames], dtype=np.int64)
+        self.left = to_pixel(population.bird_left * self.scale)
+
+        self.previous = None
+        self.blits = []
+        self.rect = pygame.Rect(self.left, 0, 0, 0)
+        self.update()
+
+    def update(self):
+        """Place the birds to draw at their current positions."""
+        self._place(self.population.bird_top)
+
+    def remember(self):
+        """Keep every bird's position from before the next step."""
+        self.previous = self.population.bird_top.copy()
+
+    def interpolate(self, alpha):
+        """Place the birds alpha of the way from their remembered positions to the current ones."""
+        if self.previous is None:
+            return
+        self._place(self.previous + (self.population.bird_top - self.previous) * alpha)
+
+    def _place(self, tops):
+        population = self.population
+        shown = population.shown(self.settings.population_draw, self.settings.population_draw_mode)
+        rotations = self.rotations
+        # Same frame as RotationCache.index picks; np.rint rounds halves to even like round does
+        frames = np.rint((population.rotation_angle[shown] - rotations.min_angle) / rotations.step)
+        frames = np.clip(frames, 0, len(rotations.frames) - 1).astype(np.int64)
+        xs = self.left + self.offsets[frames, 0]
+        ys = to_pixels(tops[shown] * self.scale) + self.offsets[frames, 1]
+        self.blits = [(rotations.frames[frame], (x, y)) for frame, x, y in zip(frames.tolist(), xs.tolist(), ys.tolist())]
+        if self.blits:
+            # Every bird is in the same column, so one rect covers them all
+            right = (xs + self.sizes[frames, 0]).max()
+            bottom = (ys + self.sizes[frames, 1]).max()
+            self.rect = pygame.Rect(xs.min(), ys.min(), right - xs.min(), bottom - ys.min())
+        else:
+            self.rect = pygame.Rect(self.left, 0, 0, 0)
+
+    def blitme(self):
+        self.screen.blits(self.blits, doreturn=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fly a population of birds through one pipe course.")
+    parser.add_argument("--birds", type=int, default=1000, help="size of the population")
+    parser.add_argument("--spread", type=float, default=40.0, help="pixels the birds' aims spread around the gap's middle")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the course and of the aims")
+    parser.add_argument("--draw", choices=("top", "sample"), help="draw the best aiming live birds or an even spread of them")
+    parser.add_argument("--count", type=int, help="birds drawn at most")
+    parser.add_argument("--headless", action="store_true", help="play generations without a window and time them")
+    parser.add_argument("--generations", type=int, default=3, help="generations played headless")
+    parser.add_argument("--steps", type=int, default=10000, help="steps a headless generation lasts at most")
+    args = parser.parse_args()
+
+    # A population's best score is not a game the player played
+    settings = Settings().override(highscore_path=None, stats_path=None)
+    if args.draw:
+        settings.population_draw_mode = args.draw
+    if args.count:
+        settings.population_draw = args.count
+    policy, aims = spread_policy(args.birds, args.spread, args.seed)
+
+    if args.headless:
+        population = Population(args.birds, Engine(settings, args.seed), policy)
+        for generation in range(args.generations):
+            population.step(True)
+            steps = 0
+            start = time.perf_counter()
+            while population.engine.stats.game_status == ACTIVE and steps < args.steps:
+                population.step()
+                steps += 1
+            elapsed = time.perf_counter() - start
+            print(f"generation {generation}: best score {population.score.max()}, "
+                  f"{np.count_nonzero(population.status == ACTIVE)} flying after {steps} steps, "
+                  f"median survival {np.median(population.active_time):.2f} s, "
+                  f"{population.n * steps / elapsed if elapsed else 0:.0f} bird steps/s")
+            population.reset()
+        return
+
+    import flappy_bird
+    fb_game = flappy_bird.FlappyBird(settings)
+    fb_game.engine.reset(args.seed)
+    population = fb_game.populate(args.birds, policy)
+    # The birds that aim closest to the middle of the gaps are drawn first
+    population.rank = np.argsort(np.argsort(np.abs(aims)))
+    fb_game.run_game()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Frame-time instrumentation for the main loop.
+
+FrameProfiler records how long each phase of every frame took, how many
+memory blocks the frame left allocated and how many garbage collections ran
+during it. The last frames are kept in fixed-size ring buffers, so profiling
+a long session costs no more memory than a short one and never allocates
+while it records.
+"""
+import csv
+import gc
+import json
+import sys
+import time
+
+class FrameProfiler:
+    """Per-phase timings of the last frames of a loop."""
+
+    def __init__(self, phases, capacity=1024, enabled=True):
+        """Prepare the ring buffers.
+
+        :param phases: names of the phases, in the order they run each frame
+        :param capacity: number of frames that are kept
+        """
+        self.phases = list(phases)
+        self.capacity = capacity
+
+        self.timings = {phase: [0.0] * capacity for phase in self.phases}
+        self.frame_times = [0.0] * capacity
+        self.allocations = [0] * capacity
+        self.collections = [0] * capacity
+        self.frames = 0
+
+        self._index = 0
+        self._frame_start = 0.0
+        self._lap_start = 0.0
+        self._blocks = 0
+        self._collections = 0
+        self._enabled = False
+        self.enabled = enabled
+
+    @property
+    def enabled(self):
+        """Whether frames are recorded; garbage collections are only counted meanwhile."""
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled):
+        # An idle profiler leaves no gc callback behind to keep it alive
+        self._enabled = enabled
+        if enabled and self._count_collection not in gc.callbacks:
+            gc.callbacks.append(self._count_collection)
+        elif not enabled:
+            self.close()
+
+    def _count_collection(self, phase, info):
+        if phase == "start":
+            self._collections += 1
+
+    def begin(self):
+        """Start timing a frame."""
+        if not self.enabled:
+            return
+        self._index = self.frames % self.capacity
+        # Phases that are skipped this frame must not keep an old frame's time
+        for timings in self.timings.values():
+            timings[self._index] = 0.0
+        self._blocks = sys.getallocatedblocks()
+        self._collections = 0
+        self._frame_start = self._lap_start = time.perf_counter()
+
+    def lap(self, phase):
+        """Add the time since the last lap to the given phase; a phase can run several times a frame."""
+        if not self.enabled or not self._frame_start:
+            return
+        now = time.perf_counter()
+        self.timings[phase][self._index] += now - self._lap_start
+        self._lap_start = now
+
+    def end(self):
+        """Finish the frame and store its totals."""
+        if not self.enabled or not self._frame_start:
+            return
+        self.frame_times[self._index] = time.perf_counter() - self._frame_start
+        self.allocations[self._index] = sys.getallocatedblocks() - self._blocks
+        self.collections[self._index] = self._collections
+        self._frame_start = 0.0
+        self.frames += 1
+
+    def _order(self):
+        """Ring buffer indexes of the recorded frames, oldest first."""
+        if self.frames <= self.capacity:
+            return range(self.frames)
+        start = self.frames % self.capacity
+        return [(start + offset) % self.capacity for offset in range(self.capacity)]
+
+    def percentiles(self, points=(50, 95, 99)):
+        """Return the frame time percentiles in seconds, keyed by percentile."""
+        times = sorted(self.frame_times[index] for index in self._order())
+        if not times:
+            return {point: 0.0 for point in points}
+        return {point: times[min(len(times) - 1, len(times) * point // 100)] for point in points}
+
+    def phase_means(self):
+        """Return the mean time of every phase in seconds."""
+        order = self._order()
+        count = max(len(order), 1)
+        return {phase: sum(self.timings[phase][index] for index in order) / count for phase in self.phases}
+
+    def summary(self):
+        """Return the recorded numbers as lines of text."""
+        order = self._order()
+        count = max(len(order), 1)
+        lines = ["frame p50 {:.2f} / p95 {:.2f} / p99 {:.2f} ms".format(
+            *(seconds * 1000 for seconds in self.percentiles().values()))]
+        for phase, seconds in self.phase_means().items():
+            lines.append(f"{phase} {seconds * 1000:.3f} ms")
+        lines.append(f"allocated blocks/frame {sum(self.allocations[index] for index in order) / count:+.1f}")
+        lines.append(f"gc runs {sum(self.collections[index] for index in order)}")
+        return lines
+
+    def rows(self):
+        """Yield one dict per recorded frame, oldest first."""
+        first = max(self.frames - self.capacity, 0)
+        for number, index in enumerate(self._order(), first):
+            row = {"frame": number, "frame_time": self.frame_times[index]}
+            for phase in self.phases:
+                row[phase] = self.timings[phase][index]
+            row["allocations"] = self.allocations[index]
+            row["collections"] = self.collections[index]
+            yield row
+
+    def dump(self, path):
+        """Write the recorded frames to a .json or .csv file."""
+        if path.endswith(".json"):
+            with open(path, "w") as outfile:
+                json.dump({"percentiles": {f"p{point}": seconds for point, seconds in self.percentiles().items()},
+                           "phase_means": self.phase_means(),
+                           "frames": list(self.rows())}, outfile, indent=1)
+        else:
+            with open(path, "w", newline="") as outfile:
+                writer = csv.DictWriter(outfile, ["frame", "frame_time"] + self.phases + ["allocations", "collections"])
+                writer.writeheader()
+                writer.writerows(self.rows())
+
+    def close(self):
+        """Stop counting garbage collections."""
+        if self._count_collection in gc.callbacks:
+            gc.callbacks.remove(self._count_collection)
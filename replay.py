@@ -0,0 +1,295 @@
+"""Record games to a compact binary log and play them back exactly.
+
+A replay file starts with a header that holds the seed of the pipe heights
+and the settings of the game. After it come one record per frame and, every
+few seconds, a snapshot of the whole engine state:
+
+    header    b"FBRP", version (u8), length (u32), zlib compressed JSON
+    frame     flags (u8), followed by dt in whole milliseconds (u16) when
+              FRAME_MS is set or by dt (f64) when FRAME_DT is set, then by
+              the seconds into the frame of its flap (f64) when FRAME_AT is set
+    snapshot  SNAPSHOT (u8), frame number (u64), game time (f64), length (u32),
+              zlib compressed JSON
+
+A frame whose time step matches the previous one takes a single byte, and
+one timed by pygame's millisecond clock takes three. The
+file is only ever appended to, and a reader stops cleanly at a record that a
+crash left half written. Snapshots let a reader jump close to any frame
+without simulating the game from the start.
+
+    python replay.py run.fbr                 play back headless at full speed
+    python replay.py run.fbr --seek 600      jump to 10 minutes in
+    python replay.py run.fbr --verify        check this build against the snapshots
+"""
+import argparse
+import json
+import random
+import struct
+import time
+import zlib
+from bisect import bisect_right
+
+from engine import Engine
+from settings import Settings
+
+MAGIC = b"FBRP"
+VERSION = 2
+
+# Flags of a frame record. A byte with SNAPSHOT set starts a snapshot instead.
+FRAME_FLAP = 0x01
+FRAME_DT = 0x02
+FRAME_MS = 0x04
+FRAME_AT = 0x08
+SNAPSHOT = 0x80
+
+_HEADER = struct.Struct("<4sBI")
+_DT = struct.Struct("<d")
+_MS = struct.Struct("<H")
+_SNAPSHOT = struct.Struct("<QdI")
+
+def new_seed():
+    """Pick a seed for a recorded game."""
+    return random.SystemRandom().getrandbits(63)
+
+def recorded_settings(settings):
+    """The static settings of a game, as JSON friendly values."""
+    return {name: value for name, value in vars(settings).items()
+            if name != "time_passed_seconds" and isinstance(value, (bool, int, float, str, tuple, type(None)))}
+
+def _pack(data):
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data))
+
+class ReplayWriter:
+    """Append the frames of a game to a replay file."""
+
+    def __init__(self, path, seed, settings, snapshot_interval=600):
+        """Create the file and write its header.
+
+        :param snapshot_interval: frames between engine snapshots
+        """
+        self.file = open(path, "wb")
+        self.snapshot_interval = snapshot_interval
+        self.frames = 0
+        self.time = 0.0
+        self.dt = None
+
+        header = _pack({"seed": seed, "settings": recorded_settings(settings),
+                        "snapshot_interval": snapshot_interval})
+        self.file.write(_HEADER.pack(MAGIC, VERSION, len(header)) + header)
+
+    def frame(self, flap, dt, at=0.0):
+        """Record the input and time step of one frame.
+
+        :param at: seconds into the frame when the flap happened
+        """
+        flags = FRAME_FLAP if flap else 0
+        offset = _DT.pack(at) if flap and at > 0 else b""
+        if offset:
+            flags |= FRAME_AT
+        if dt != self.dt:
+            self.dt = dt
+            milliseconds = round(dt * 1000)
+            if milliseconds / 1000 == dt and 0 <= milliseconds <= 0xFFFF:
+                self.file.write(bytes((flags | FRAME_MS,)) + _MS.pack(milliseconds) + offset)
+            else:
+                self.file.write(bytes((flags | FRAME_DT,)) + _DT.pack(dt) + offset)
+        else:
+            self.file.write(bytes((flags,)) + offset)
+        self.frames += 1
+        self.time += dt
+
+    def snapshot_due(self):
+        return self.frames % self.snapshot_interval == 0
+
+    def snapshot(self, engine):
+        """Record the engine state after the frames written so far."""
+        state = _pack(engine.get_state())
+        self.file.write(bytes((SNAPSHOT,)) + _SNAPSHOT.pack(self.frames, self.time, len(state)) + state)
+        self.file.flush()
+        # The frame after a snapshot always carries its time step, so a
+        # reader that starts at the snapshot never has to look further back
+        self.dt = None
+
+    def close(self):
+        self.file.close()
+
+class ReplayReader:
+    """Read a replay file and index its snapshots."""
+
+    def __init__(self, path):
+        with open(path, "rb") as infile:
+            self.data = infile.read()
+
+        magic, version, length = _HEADER.unpack_from(self.data)
+        # Version 1 files only lack FRAME_AT
+        if magic != MAGIC or not 1 <= version <= VERSION:
+            raise ValueError(f"{path} is not a version 1 to {VERSION} replay")
+        header = _unpack(self.data[_HEADER.size:_HEADER.size + length])
+        self.seed = header["seed"]
+        self.settings = Settings().override(**{name: tuple(value) if isinstance(value, list) else value
+                                               for name, value in header["settings"].items()})
+        self.snapshot_interval = header["snapshot_interval"]
+        self.start = _HEADER.size + length
+
+        # Frame number, game time and file offset of every snapshot
+        self.snapshot_frames = []
+        self.snapshot_times = []
+        self.snapshot_offsets = []
+        self.frame_count = 0
+        self._index()
+
+    def _index(self):
+        """Find every snapshot and count the frames, skipping over snapshot bodies."""
+        data = self.data
+        offset = self.start
+        frames = 0
+        while offset < len(data):
+            flags = data[offset]
+            if flags & SNAPSHOT:
+                if offset + 1 + _SNAPSHOT.size > len(data):
+                    break
+                frame, seconds, length = _SNAPSHOT.unpack_from(data, offset + 1)
+                if offset + 1 + _SNAPSHOT.size + length > len(data):
+                    break
+                self.snapshot_frames.append(frame)
+                self.snapshot_times.append(seconds)
+                self.snapshot_offsets.append(offset)
+                offset += 1 + _SNAPSHOT.size + length
+                continue
+            size = 1 + (_DT.size if flags & FRAME_DT else _MS.size if flags & FRAME_MS else 0)
+            size += _DT.size if flags & FRAME_AT else 0
+            if offset + size > len(data):
+                break
+            offset += size
+            frames += 1
+        self.frame_count = frames
+        self.end = offset
+
+    def records(self, offset=None):
+        """Yield the records from an offset as ("frame", flap, dt, at) or ("snapshot", frame, state)."""
+        data = self.data
+        offset = self.start if offset is None else offset
+        dt = None
+        while offset < self.end:
+            flags = data[offset]
+            if flags & SNAPSHOT:
+                frame, seconds, length = _SNAPSHOT.unpack_from(data, offset + 1)
+                body = offset + 1 + _SNAPSHOT.size
+                offset = body + length
+                yield "snapshot", frame, data[body:offset]
+                continue
+            if flags & FRAME_DT:
+                dt, = _DT.unpack_from(data, offset + 1)
+                offset += 1 + _DT.size
+            elif flags & FRAME_MS:
+                dt = _MS.unpack_from(data, offset + 1)[0] / 1000
+                offset += 1 + _MS.size
+            else:
+                offset += 1
+            at = 0.0
+            if flags & FRAME_AT:
+                at, = _DT.unpack_from(data, offset)
+                offset += _DT.size
+            yield "frame", bool(flags & FRAME_FLAP), dt, at
+
+    def player(self, engine=None):
+        """Return a ReplayPlayer for this file."""
+        return ReplayPlayer(self, engine)
+
+class ReplayPlayer:
+    """Feed the frames of a replay into an engine, one at a time or by seeking."""
+
+    def __init__(self, reader, engine=None):
+        self.reader = reader
+        self.engine = engine if engine is not None else Engine(reader.settings)
+        self.mismatches = []
+        self.rewind()
+
+    def rewind(self):
+        """Go back to the first frame."""
+        self.engine.reset(self.reader.seed)
+        self.frame = 0
+        self.time = 0.0
+        self._records = self.reader.records()
+
+    def next_frame(self, verify=False):
+        """Return the flap, time step and flap offset of the next frame, or None at the end.
+
+        With verify, snapshots met along the way are compared to the engine
+        and the frames where they differ are added to mismatches.
+        """
+        for record in self._records:
+            if record[0] == "snapshot":
+                if verify and _unpack(record[2]) != json.loads(json.dumps(self.engine.get_state())):
+                    self.mismatches.append(record[1])
+                continue
+            self.frame += 1
+            self.time += record[2]
+            return record[1:]
+        return None
+
+    def step(self, verify=False):
+        """Play the next frame on the engine; False once the replay has ended."""
+        frame = self.next_frame(verify)
+        if frame is None:
+            return False
+        self.engine.step(*frame)
+        return True
+
+    def seek(self, frame=None, seconds=None):
+        """Move to a frame number or to a game time in seconds.
+
+        The engine restores the last snapshot before the target, unless the
+        player is already past it, and only simulates the frames after it.
+        """
+        reader = self.reader
+        if seconds is not None:
+            index = bisect_right(reader.snapshot_times, seconds) - 1
+            reached = lambda: self.time >= seconds
+        else:
+            index = bisect_right(reader.snapshot_frames, frame) - 1
+            reached = lambda: self.frame >= frame
+
+        if index >= 0 and (reader.snapshot_frames[index] > self.frame or reached()):
+            records = reader.records(reader.snapshot_offsets[index])
+            kind, snapshot_frame, state = next(records)
+            self.engine.set_state(_unpack(state))
+            self.frame = snapshot_frame
+            self.time = reader.snapshot_times[index]
+            self._records = records
+        elif reached():
+            self.rewind()
+        while not reached() and self.step():
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back a Flappy Bird replay without a window.")
+    parser.add_argument("path")
+    parser.add_argument("--seek", type=float, metavar="SECONDS", help="jump to this many seconds of game time first")
+    parser.add_argument("--verify", action="store_true", help="compare the engine with every snapshot in the file")
+    args = parser.parse_args()
+
+    reader = ReplayReader(args.path)
+    player = reader.player()
+    start = time.perf_counter()
+    if args.seek:
+        player.seek(seconds=args.seek)
+        print(f"seeked to frame {player.frame} ({player.time:.2f} s) in {time.perf_counter() - start:.3f} s")
+    while player.step(args.verify):
+        pass
+    elapsed = time.perf_counter() - start
+
+    engine = player.engine
+    print(f"{player.frame} frames in {elapsed:.3f} s ({player.frame / max(elapsed, 1e-9):.0f} frames/s), "
+          f"final score {engine.stats.score}, status {engine.stats.game_status}")
+    if args.verify:
+        if player.mismatches:
+            print(f"engine diverged from the recording at snapshot frames {player.mismatches}")
+        else:
+            print(f"all {len(reader.snapshot_frames)} snapshots match")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Run many headless episodes in parallel across CPU cores.
+
+Episodes are spread over a multiprocessing pool. Every episode gets its own
+seed derived from the run's base seed, so results do not depend on how many
+processes there are or which one ran it. Workers write each trajectory
+straight into a shared memory block and only send back a few numbers per
+episode, so nothing is pickled per frame. The block only holds the chunks
+of episodes in flight; a chunk's rows are copied out and handed to the
+next chunk as soon as it finishes, so its size depends on the number of
+processes and max_steps, not on how many episodes are played.
+
+Example, sweeping pipe_space over all cores:
+
+    python rollout.py --episodes 2000 --sweep pipe_space=150,200,250
+"""
+import argparse
+import math
+import multiprocessing
+import queue
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from engine import Engine, OVER
+from settings import Settings
+
+EpisodeResult = namedtuple("EpisodeResult", "index variant seed score steps survival_time trajectory flaps")
+
+def hover_policy(engine):
+    """Flap whenever the bird sinks below the middle of the next gap."""
+    bird = engine.bird
+    target = engine.settings.screen_height // 2
+    for pipe in engine.pipes:
+        if pipe.left + pipe.width > bird.left:
+            target = (pipe.top + pipe.bottom) // 2 + bird.height // 2
+            break
+    return not bird.isjump and bird.bottom > target
+
+def lookahead_policy(engine, horizon=120):
+    """Try flapping and not flapping, play both futures on with hover_policy and
+    pick the one the bird survives longer; the engine is left as it was."""
+    start = engine.snapshot()
+    # On a tie, like both futures lasting the whole horizon, hover_policy decides
+    hover = hover_policy(engine)
+    best_action, best_frames = hover, -1
+    for action in (hover, not hover):
+        engine.restore(start)
+        engine.step(action)
+        frames = 0
+        while frames < horizon and engine.stats.game_status != OVER:
+            engine.step(hover_policy(engine))
+            frames += 1
+        if frames > best_frames:
+            best_action, best_frames = action, frames
+    engine.restore(start)
+    return best_action
+
+def make_settings(overrides):
+    """Build a Settings with some static settings changed."""
+    return Settings().override(**overrides)
+
+# Per-process state, filled in by _attach
+_worker = {}
+
+# Episodes a worker plays per task at most; bounds the rows in flight
+MAX_CHUNK = 16
+# Chunks in flight per worker, so a worker has its next chunk while one is copied out
+CHUNKS_PER_PROCESS = 2
+
+def _attach(name, episodes, max_steps):
+    """Map a run's shared trajectory block into this worker, once per run."""
+    if _worker.get("name") != name:
+        if "shm" in _worker:
+            # The array views have to go before the block can be closed
+            del _worker["y"], _worker["flaps"]
+            _worker["shm"].close()
+        shm = shared_memory.SharedMemory(name=name)
+        _worker.update(name=name, shm=shm, **_views(shm, episodes, max_steps))
+    return _worker["y"], _worker["flaps"]
+
+def _views(shm, episodes, max_steps):
+    """Split a shared block into the bird y and flap arrays of a run."""
+    y = np.ndarray((episodes, max_steps), dtype=np.float32, buffer=shm.buf)
+    flaps = np.ndarray((episodes, max_steps), dtype=np.uint8, buffer=shm.buf, offset=y.nbytes)
+    return {"y": y, "flaps": flaps}
+
+def _run_chunk(tasks):
+    """Play a chunk of episodes in a worker."""
+    return [_run_episode(task) for task in tasks]
+
+def _run_episode(task):
+    """Play one episode in a worker and record its trajectory in its row of shared memory."""
+    name, rows, max_steps, row, index, variant, overrides, seed, policy, dt = task
+    y, flaps = _attach(name, rows, max_steps)
+
+    engine = Engine(make_settings(overrides), seed)
+    engine.step(True, dt)
+    steps = 0
+    while steps < max_steps and engine.stats.game_status != OVER:
+        action = bool(policy(engine))
+        engine.step(action, dt)
+        y[row, steps] = engine.bird.y
+        flaps[row, steps] = action
+        steps += 1
+    return row, index, variant, seed, engine.stats.score, steps, engine.active_time
+
+class RolloutPool:
+    """A pool of worker processes that play headless episodes."""
+
+    def __init__(self, processes=None, policy=hover_policy, max_steps=60 * 60 * 5, dt=None):
+        """Start the workers.
+
+        :param policy: picklable function from an Engine to a flap decision
+        :param max_steps: episodes that survive this many steps are cut off
+        :param dt: time step of every episode, Settings.time_step by default
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.policy = policy
+        self.max_steps = max_steps
+        self.dt = dt
+
+        # Workers must share the parent's resource tracker, otherwise each one
+        # starts its own and reports the parent's shared blocks as leaked
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(self.processes)
+
+    def run(self, episodes, seed=0, variants=None):
+        """Play episodes for every settings variant, yielding results as they finish.
+
+        :param variants: list of dicts of settings overrides, one run of
+            episodes each; a single run with the default settings if None
+        """
+        variants = variants or [{}]
+        tasks = [(variant * episodes + episode, variant, variants[variant], seed + episode)
+                 for variant in range(len(variants)) for episode in range(episodes)]
+        chunksize = max(1, min(MAX_CHUNK, math.ceil(len(tasks) / (self.processes * 8))))
+        chunks = iter([tasks[start:start + chunksize] for start in range(0, len(tasks), chunksize)])
+        blocks = max(1, min(math.ceil(len(tasks) / chunksize), self.processes * CHUNKS_PER_PROCESS))
+        rows = blocks * chunksize
+        nbytes = rows * self.max_steps * (np.dtype(np.float32).itemsize + np.dtype(np.uint8).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        views = None
+        # Finished chunks, or the exception a chunk raised, in the order they finish
+        done = queue.SimpleQueue()
+        free = list(range(blocks))
+        pending = 0
+        try:
+            views = _views(shm, rows, self.max_steps)
+            while True:
+                while free:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    block = free.pop()
+                    job = [(shm.name, rows, self.max_steps, block * chunksize + offset) + task + (self.policy, self.dt)
+                           for offset, task in enumerate(chunk)]
+                    self.pool.apply_async(_run_chunk, (job,), callback=lambda results, block=block: done.put((block, results)),
+                                          error_callback=done.put)
+                    pending += 1
+                if not pending:
+                    break
+                finished = done.get()
+                if isinstance(finished, BaseException):
+                    raise finished
+                block, results = finished
+                pending -= 1
+                for row, index, variant, episode_seed, score, steps, survival_time in results:
+                    yield EpisodeResult(index, variant, episode_seed, score, steps, survival_time,
+                                        views["y"][row, :steps].copy(), views["flaps"][row, :steps].copy())
+                free.append(block)
+        finally:
+            del views
+            shm.close()
+            shm.unlink()
+
+    def sweep(self, variants, episodes, seed=0):
+        """Play every variant and return the results grouped by variant."""
+        results = [[] for variant in variants]
+        for result in self.run(episodes, seed, variants):
+            results[result.variant].append(result)
+        for variant_results in results:
+            variant_results.sort(key=lambda result: result.index)
+        return results
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _parse_sweep(specs):
+    """Turn name=v1,v2 arguments into the cross product of settings variants."""
+    variants = [{}]
+    for spec in specs:
+        name, values = spec.split("=", 1)
+        values = [float(value) if "." in value else int(value) for value in values.split(",")]
+        variants = [dict(variant, **{name: value}) for variant in variants for value in values]
+    return variants
+
+def main():
+    parser = argparse.ArgumentParser(description="Play headless Flappy Bird episodes in parallel.")
+    parser.add_argument("--episodes", type=int, default=1000, help="episodes per settings variant")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--max-steps", type=int, default=60 * 60 * 5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2",
+                        help="setting to vary, may be repeated")
+    args = parser.parse_args()
+
+    variants = _parse_sweep(args.sweep)
+    start = time.perf_counter()
+    with RolloutPool(args.processes, max_steps=args.max_steps) as pool:
+        results = pool.sweep(variants, args.episodes, args.seed)
+        processes = pool.processes
+    elapsed = time.perf_counter() - start
+
+    steps = 0
+    for variant, variant_results in zip(variants, results):
+        scores = [result.score for result in variant_results]
+        steps += sum(result.steps for result in variant_results)
+        print(f"{variant or 'default settings'}: mean score {sum(scores) / len(scores):.2f}, "
+              f"best {max(scores)}, mean survival "
+              f"{sum(result.survival_time for result in variant_results) / len(variant_results):.2f} s")
+    print(f"{steps} steps in {elapsed:.2f} s on {processes} processes ({steps / elapsed:.0f} steps/s)")
+
+if __name__ == "__main__":
+    main()
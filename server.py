@@ -0,0 +1,342 @@
+"""Many headless games in one process, played and watched over TCP.
+
+A GameServer steps every session's Engine on one shared tick of
+Settings.time_step. Clients connect to a plain TCP port and send one
+command per line:
+
+    play        start a new session and play it
+    watch N     follow session N as a spectator
+    flap        flap in the session this connection plays
+    sessions    list the running sessions
+    stats       report the server's tick timings
+
+After play or watch the server sends the session's state as one JSON
+object per line: the first one complete, then only the fields that changed
+since the tick before, like
+
+    {"tick": 812, "session": 3, "y": 297, "angle": 12.5, "pipes": [[640, 180, 380]]}
+
+with the fields status, score, y (top of the bird), angle and pipes (left,
+gap top and gap bottom of every pair). A connection that reads too slowly
+skips ticks and gets a complete state again once it caught up. The
+standard library has no WebSocket server; browsers can reach the same port
+through a WebSocket to TCP bridge like websockify.
+
+    python server.py                                     serve on Settings.server_host:server_port
+    python server.py --load-test 300 --seconds 10        play 300 simulated players against a running server
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import deque
+
+from engine import Engine, ACTIVE
+from settings import Settings
+
+def game_state(engine):
+    """The part of a game that spectators see, as JSON friendly values."""
+    return {"status": engine.stats.game_status,
+            "score": engine.stats.score,
+            "y": engine.bird.top,
+            "angle": round(engine.bird.rotation_angle, 1),
+            "pipes": [[pipe.left, pipe.top, pipe.bottom] for pipe in engine.pipes]}
+
+def _line(message):
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+class Session:
+    """One headless game and the connections that play and watch it."""
+
+    def __init__(self, number, settings, seed=None):
+        self.number = number
+        self.engine = Engine(settings, seed)
+        self.player = None
+        self.spectators = []
+        self.flap_requested = False
+        self.state = {}
+
+    def step(self):
+        self.engine.step(self.flap_requested)
+        self.flap_requested = False
+
+    def changes(self):
+        """Return the fields of the state that changed since the last call."""
+        state = game_state(self.engine)
+        changed = {name: value for name, value in state.items() if self.state.get(name) != value}
+        self.state = state
+        return changed
+
+class Connection:
+    """A client, with the session it plays or watches."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.session = None
+        self.playing = False
+        # The next message has to be a complete state
+        self.resync = True
+
+class GameServer:
+    """Hosts any number of sessions and steps them all on a shared tick."""
+
+    def __init__(self, settings=None, seed=None):
+        """
+        :param seed: base seed; session n plays seed + n if given
+        """
+        self.settings = settings if settings is not None else Settings()
+        self.seed = seed
+        self.sessions = {}
+        self.connections = set()
+        self.sessions_started = 0
+        self.tick = 0
+
+        # How long each tick's work took and how late it started, for the report
+        samples = self.settings.server_report_ticks
+        self.work_times = deque(maxlen=samples)
+        self.lateness = deque(maxlen=samples)
+        self.cpu_times = deque(maxlen=samples)
+        self.skipped_messages = 0
+        self.server = None
+
+    async def serve(self, host=None, port=None):
+        """Accept connections and run the ticks until cancelled."""
+        host = self.settings.server_host if host is None else host
+        port = self.settings.server_port if port is None else port
+        self.server = await asyncio.start_server(self._handle, host, port)
+        async with self.server:
+            await self._run_ticks()
+
+    async def _run_ticks(self):
+        step = self.settings.time_step
+        deadline = time.perf_counter()
+        cpu = time.process_time()
+        while True:
+            deadline += step
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Behind by more than a tick: skip the missed ones instead of rushing them
+                await asyncio.sleep(0)
+                if -delay > step:
+                    deadline = time.perf_counter()
+            start = time.perf_counter()
+            self.lateness.append(max(start - deadline, 0.0))
+            self.step()
+            self.work_times.append(time.perf_counter() - start)
+            now = time.process_time()
+            self.cpu_times.append(now - cpu)
+            cpu = now
+
+    def step(self):
+        """Advance every session by one tick and send out what changed."""
+        self.tick += 1
+        for session in self.sessions.values():
+            session.step()
+            changes = session.changes()
+            message = _line(dict(tick=self.tick, session=session.number, **changes)) if changes else None
+            full = None
+            for connection in ([session.player] if session.player else []) + session.spectators:
+                if connection.resync:
+                    full = full or _line(dict(tick=self.tick, session=session.number, **session.state))
+                    self._send(connection, full)
+                elif message:
+                    self._send(connection, message)
+
+    def _send(self, connection, message):
+        """Queue a message, or skip it if the connection is not keeping up."""
+        transport = connection.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > self.settings.server_buffer_limit:
+            self.skipped_messages += 1
+            connection.resync = True
+            return
+        connection.writer.write(message)
+        connection.resync = False
+
+    async def _handle(self, reader, writer):
+        connection = Connection(reader, writer)
+        self.connections.add(connection)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._command(connection, line.decode(errors="replace").split())
+        except ConnectionError:
+            pass
+        finally:
+            self._leave(connection)
+            self.connections.discard(connection)
+            writer.close()
+
+    def _command(self, connection, words):
+        if not words:
+            return
+        command = words[0]
+        if command == "flap":
+            if connection.playing:
+                connection.session.flap_requested = True
+        elif command == "play":
+            self._leave(connection)
+            number = self.sessions_started
+            self.sessions_started += 1
+            session = Session(number, self.settings, None if self.seed is None else self.seed + number)
+            self.sessions[number] = session
+            session.player = connection
+            connection.session = session
+            connection.playing = True
+            connection.resync = True
+        elif command == "watch" and len(words) == 2 and words[1].isdigit() and int(words[1]) in self.sessions:
+            self._leave(connection)
+            connection.session = self.sessions[int(words[1])]
+            connection.session.spectators.append(connection)
+            connection.resync = True
+        elif command == "sessions":
+            connection.writer.write(_line({"sessions": list(self.sessions)}))
+        elif command == "stats":
+            connection.writer.write(_line({"stats": self.stats()}))
+        else:
+            connection.writer.write(_line({"error": f"unknown command: {' '.join(words)}"}))
+
+    def _leave(self, connection):
+        """Stop playing or watching; a session ends when its player leaves."""
+        session = connection.session
+        if session is None:
+            return
+        if connection.playing:
+            del self.sessions[session.number]
+            for spectator in session.spectators:
+                spectator.writer.write(_line({"session": session.number, "closed": True}))
+                spectator.session = None
+        else:
+            session.spectators.remove(connection)
+        connection.session = None
+        connection.playing = False
+
+    def stats(self):
+        """Return the tick timings of the last ticks and what they cost."""
+        ticks = max(len(self.work_times), 1)
+        cpu = sum(self.cpu_times) / (ticks * self.settings.time_step)
+        return {"sessions": len(self.sessions),
+                "connections": len(self.connections),
+                "ticks": self.tick,
+                "tick_ms": statistics.fmean(self.work_times) * 1000 if self.work_times else 0.0,
+                "max_tick_ms": max(self.work_times, default=0.0) * 1000,
+                "late_ms": statistics.fmean(self.lateness) * 1000 if self.lateness else 0.0,
+                "max_late_ms": max(self.lateness, default=0.0) * 1000,
+                "cpu": cpu,
+                # How many sessions one core could keep up with at this load
+                "sessions_per_core": len(self.sessions) / cpu if cpu else None,
+                "skipped_messages": self.skipped_messages}
+
+    def report(self):
+        stats = self.stats()
+        per_core = "-" if stats["sessions_per_core"] is None else f"{stats['sessions_per_core']:.0f}"
+        return (f"{stats['sessions']} sessions, {stats['connections']} connections, "
+                f"tick {stats['tick_ms']:.2f} ms (max {stats['max_tick_ms']:.2f}), "
+                f"late {stats['late_ms']:.2f} ms (max {stats['max_late_ms']:.2f}), "
+                f"cpu {stats['cpu']:.0%}, {per_core} sessions/core, {stats['skipped_messages']} skipped")
+
+async def _report_every(server, seconds):
+    while True:
+        await asyncio.sleep(seconds)
+        print(server.report())
+
+async def simulated_player(host, port, seconds, settings, results):
+    """Play one session like a player would: flap when the bird sinks below the next gap."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"play\n")
+    state = {}
+    previous_y = None
+    arrivals = []
+    flaps = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        try:
+            line = await asyncio.wait_for(reader.readline(), end - time.perf_counter())
+        except asyncio.TimeoutError:
+            break
+        if not line:
+            break
+        arrivals.append(time.perf_counter())
+        state.update(json.loads(line))
+
+        y = state.get("y", 0)
+        target = settings.screen_height // 2
+        for left, top, bottom in state.get("pipes", ()):
+            if left + settings.pipe_width > settings.screen_width // 4:
+                target = (top + bottom) // 2
+                break
+        sinking = previous_y is not None and y > previous_y
+        previous_y = y
+        # Out of an active game a flap starts or restarts it
+        if state.get("status") != ACTIVE or (sinking and y + settings.bird_height // 2 > target):
+            writer.write(b"flap\n")
+            flaps += 1
+    writer.close()
+    intervals = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    results.append((len(arrivals), flaps, intervals))
+
+async def server_stats(host, port, delay=0.0):
+    """Ask a running server for its stats after delay seconds."""
+    await asyncio.sleep(delay)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"stats\n")
+    stats = json.loads(await reader.readline())["stats"]
+    writer.close()
+    return stats
+
+async def load_test(host, port, players, seconds, settings):
+    """Connect simulated players, then print what they saw and the server's stats."""
+    results = []
+    # Halfway through, while every player is still connected
+    stats = asyncio.ensure_future(server_stats(host, port, seconds / 2))
+    await asyncio.gather(*(simulated_player(host, port, seconds, settings, results) for player in range(players)))
+    intervals = [interval for messages, flaps, player_intervals in results for interval in player_intervals]
+    messages = sum(messages for messages, flaps, player_intervals in results)
+    print(f"{players} players, {messages / seconds:.0f} messages/s, "
+          f"{sum(flaps for messages, flaps, player_intervals in results)} flaps")
+    if intervals:
+        print(f"message interval {statistics.fmean(intervals) * 1000:.2f} ms "
+              f"+- {statistics.pstdev(intervals) * 1000:.2f} ms (max {max(intervals) * 1000:.2f} ms), "
+              f"tick {settings.time_step * 1000:.2f} ms")
+    print("server", await stats)
+
+def main():
+    parser = argparse.ArgumentParser(description="Host headless Flappy Bird sessions over TCP, or load test a server.")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None, help="base seed of the sessions")
+    parser.add_argument("--report", type=float, default=5.0, metavar="SECONDS", help="print the tick timings this often")
+    parser.add_argument("--load-test", type=int, metavar="PLAYERS", help="connect simulated players instead of serving")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long the load test plays")
+    args = parser.parse_args()
+
+    settings = Settings()
+    host = settings.server_host if args.host is None else args.host
+    port = settings.server_port if args.port is None else args.port
+    if args.load_test:
+        asyncio.run(load_test(host, port, args.load_test, args.seconds, settings))
+        return
+
+    async def serve():
+        server = GameServer(settings, args.seed)
+        reporter = asyncio.ensure_future(_report_every(server, args.report))
+        try:
+            await server.serve(host, port)
+        finally:
+            reporter.cancel()
+
+    print(f"serving on {host}:{port}")
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+class Settings:
+    def __init__(self):
+        """Initialize the game's static settings."""
+        # Screen settings
+        self.screen_width = 1000
+        self.screen_height = 680
+        self.bg_color = (255, 255, 255) # unnecessary because the background image covers the entire background
+        self.screen_flags = 0
+        self.screen_depth = 32
+        self.render_mode = "full" # "full" redraws every frame, "dirty" only what changed
+        self.asset_pack_path = "assets.pack" # built by assetpack.py; loose files are loaded if it is missing
+        self.render_scale = 1.0 # window pixels per screen_width/screen_height unit; below 1 draws fewer pixels on slow devices
+
+        # Frame pacing, see pacing.py
+        self.pacing_mode = "uncapped" # "uncapped", "capped" at max_fps, "vsync", or "fixed" time_step engine steps
+        self.max_fps = 60 # frame rate of the capped and fixed modes
+        self.pacing_busy_loop = False # wait with tick_busy_loop: more exact frame times, but a busy core
+        self.max_steps_per_frame = 5 # fixed steps run per frame at most; time beyond that is dropped
+        self.pacing_samples = 600 # frames the pacing report is measured over
+        self.input_poll_interval = 0.001 # seconds between input polls while the capped and fixed modes wait
+        self.input_latency_samples = 256 # flaps the input latency report is measured over
+
+        # Simulation settings
+        self.time_step = 1 / 60 # seconds the engine advances per step unless told otherwise
+        self.collision_mode = "rect" # "rect" tests the unrotated bird rect, "mask" the pixels of the rotated bird
+        self.replay_snapshot_interval = 600 # frames between engine snapshots in a replay file
+
+        # Bird settings
+        # gravity
+        self.bird_gravity = 2500
+        self.bird_initial_velocity = 0
+        self.bird_max_velocity = 2000
+        # jumping
+        self.bird_initial_jumping_velocity = 600
+        self.bird_max_jumping_height = self.bird_initial_jumping_velocity / self.bird_gravity / 2 * self.bird_initial_jumping_velocity
+        # rotation
+        self.bird_rise_angle = 25
+        self.bird_fall_angle = -60
+        self.bird_max_falling_height = -300
+        self.bird_rotation_step = 1 # degrees between the cached rotation frames
+        # size of bird.png, used as the bird's hitbox
+        self.bird_width = 52
+        self.bird_height = 37
+        
+        # Ground settings
+        self.ground_speed = 200
+        self.ground_height = self.screen_height - 100
+        self.ground_tile_height = 112 # height of ground.png
+
+        # Pipe settings
+        self.pipe_speed = self.ground_speed # matches the ground speed because...
+        self.pipe_space = 200 # space between the up and down pipes
+        self.pipe_distance = self.screen_width - 300 # frequency of pipes
+        self.pipe_initial_height = 100
+        self.pipe_start_time = 2 # seconds into a game before the pipes start moving
+        self.level_path = None # pipe schedule made by levels.py; None draws random heights
+        # size of uppipe.png and downpipe.png
+        self.pipe_width = 160
+        self.pipe_height = 391
+        # pipe facing down
+        self.pipe_min_top = self.pipe_initial_height
+        self.pipe_max_top = self.ground_height - self.pipe_initial_height - self.pipe_space
+
+        # Background settings
+        self.background_speed = -50.0
+        self.background_scroll_step = None # pixels; None scrolls 1 at a time, or flappy_bird.DIRTY_SCROLL_STEP in the "dirty" render mode
+
+        # Sound settings
+        self.sound_frequency = 44100
+        self.sound_buffer = 512 # samples per mixer buffer; smaller plays sooner but underruns more easily
+        self.sound_min_interval = 0.05 # seconds before the same effect may start again
+
+        # Ready messages settings
+        self.ready_font_path = "score_font.ttf" # same as score font
+        self.flappy_font_path = self.ready_font_path
+        self.flappy_font_size = 100
+        self.flappy_text_color = (237, 112, 20)
+        self.getready_font_path = self.ready_font_path
+        self.getready_font_size = 80
+        self.getready_text_color = (60, 176, 67)
+        self.press_font_path = self.ready_font_path
+        self.press_font_size = 50
+        self.press_text_color = (0, 0, 0)
+
+        # Over messages settings
+        self.highscore_path = "highscore.txt" # None keeps the highscore in memory only
+        self.stats_path = "stats.bin" # log of every finished game, None to keep none
+        self.gameover_font_path = self.ready_font_path
+        self.gameover_font_size = 100
+        self.gameover_text_color = (178, 34, 34)
+        self.score_rect_color = (0, 0, 0)
+        self.score_font_path = self.ready_font_path
+        self.score_font_size = 50
+        self.score_text_color = (255, 255, 255)
+        self.highscore_font_path = self.score_font_path
+        self.highscore_font_size = 50
+        self.highscore_text_color = (255, 255, 255)
+        self.border_width = 10
+        self.border_color = (0, 150, 0)
+
+        # Profiler settings
+        self.profile_frames = 1024 # frames kept in the profiler's ring buffer
+        self.overlay_font_size = 22
+        self.overlay_text_color = (255, 255, 255)
+        self.overlay_background_color = (0, 0, 0)
+        self.overlay_refresh_seconds = 0.25
+
+        # Scoreboard settings
+        self.activescore_font_path = self.ready_font_path
+        self.activescore_font_size = 100
+        self.activescore_color = (0, 0, 0)
+
+        # Capture settings, see capture.py
+        self.capture_buffers = 8 # frames that can wait for the writer threads before capturing waits
+        self.capture_png_level = 1 # zlib level of captured PNGs; higher is smaller but slower
+
+        # Server settings, see server.py
+        self.server_host = "127.0.0.1"
+        self.server_port = 8765
+        self.server_buffer_limit = 64 * 1024 # bytes queued for a slow connection before it skips ticks
+        self.server_report_ticks = 600 # ticks the server's timings are measured over
+
+        # Population settings, see population.py
+        self.population_draw = 32 # live birds drawn at most in population mode
+        self.population_draw_mode = "top" # draw the best ranked live birds, or "sample" an even spread of them
+
+        self.initialize_dynamic_settings()
+
+    def override(self, **values):
+        """Change static settings and recompute the ones derived from them.
+
+        Derived settings that are passed in explicitly are kept as given.
+        """
+        for name, value in values.items():
+            if not hasattr(self, name):
+                raise AttributeError(f"unknown setting: {name}")
+            setattr(self, name, value)
+
+        if "ground_height" not in values:
+            self.ground_height = self.screen_height - 100
+        if "pipe_speed" not in values:
+            self.pipe_speed = self.ground_speed
+        if "pipe_distance" not in values:
+            self.pipe_distance = self.screen_width - 300
+        if "bird_max_jumping_height" not in values:
+            self.bird_max_jumping_height = self.bird_initial_jumping_velocity / self.bird_gravity / 2 * self.bird_initial_jumping_velocity
+        if "pipe_min_top" not in values:
+            self.pipe_min_top = self.pipe_initial_height
+        if "pipe_max_top" not in values:
+            self.pipe_max_top = self.ground_height - self.pipe_initial_height - self.pipe_space
+        return self
+
+    def initialize_dynamic_settings(self):
+        """Initialize settings that change throughout the game."""
+        self.time_passed_seconds = 0.0
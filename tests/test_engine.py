@@ -0,0 +1,19 @@
+import pytest
+
+from engine import Engine
+
+@pytest.mark.parametrize("seed", [2 ** 63, -2 ** 63 - 1, 2 ** 70, "course", b"course"])
+def test_any_seed_survives_a_snapshot(seed):
+    engine = Engine(seed=seed)
+    engine.step(True)
+    for step in range(200):
+        engine.step(False)
+
+    copy = Engine(seed=0)
+    copy.restore(engine.snapshot())
+    assert copy.seed == engine.seed
+    assert [pipe.top for pipe in copy.pipes] == [pipe.top for pipe in engine.pipes]
+
+def test_small_int_seeds_are_kept():
+    assert Engine(seed=7).seed == 7
+    assert Engine(seed=-7).seed == -7
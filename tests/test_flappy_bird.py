@@ -0,0 +1,70 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pytest
+
+import flappy_bird
+from replay import ReplayReader
+from settings import Settings
+
+@pytest.fixture
+def fb_game(monkeypatch):
+    # The assets are loaded from the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    settings = Settings().override(highscore_path=None, stats_path=None, pacing_mode="fixed")
+    fb_game = flappy_bird.FlappyBird(settings)
+    yield fb_game
+    fb_game.scores.close()
+    fb_game.assets.wait()
+
+def test_fixed_step_flaps_at_key_time(fb_game):
+    """A key pressed during the third step of a frame flaps in that step, halfway into it."""
+    calls = []
+    step = fb_game.engine.step
+    fb_game.engine.step = lambda action=False, dt=None, at=0.0: calls.append((action, dt, at)) or step(action, dt, at)
+
+    dt = fb_game.settings.time_step
+    fb_game.pacer.frame_time = 1000.0
+    fb_game.settings.time_passed_seconds = 3.25 * dt
+    start = fb_game.pacer.frame_time - 3.25 * dt
+    fb_game.flap_requested = True
+    fb_game.flap_time = start + 2.5 * dt
+    fb_game._update_fixed()
+
+    assert [action for action, step_dt, at in calls] == [False, False, True]
+    assert calls[2][2] == pytest.approx(0.5 * dt)
+    assert fb_game.input.pending == [start + 2.5 * dt]
+    assert not fb_game.flap_requested and fb_game.flap_time is None
+
+def test_fixed_step_keeps_key_after_frame(fb_game):
+    """A key pressed after the frame's last step waits for the next frame with its time."""
+    dt = fb_game.settings.time_step
+    fb_game.pacer.frame_time = 1000.0
+    fb_game.settings.time_passed_seconds = 2.25 * dt
+    fb_game.flap_requested = True
+    fb_game.flap_time = 1000.0 - 0.1 * dt
+    fb_game._update_fixed()
+
+    assert fb_game.flap_requested and fb_game.flap_time == 1000.0 - 0.1 * dt
+    assert fb_game.input.pending == []
+
+def test_replay_plays_only_its_recorded_frames(fb_game, tmp_path):
+    """Once a replay runs out, the frame that finds it over does not step the engine."""
+    path = str(tmp_path / "game.fbr")
+    fb_game.record(path)
+    dt = fb_game.settings.time_step
+    for frame in range(30):
+        fb_game.settings.time_passed_seconds = dt
+        fb_game.flap_requested = frame % 10 == 0
+        fb_game._update_frame()
+    fb_game.recorder.close()
+    fb_game.recorder = None
+
+    fb_game.replay(ReplayReader(path))
+    frames = 0
+    while fb_game._update_frame():
+        frames += 1
+    assert frames == 30
+    assert fb_game.player is None and fb_game.engine.frame == 30
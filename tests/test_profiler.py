@@ -0,0 +1,16 @@
+import time
+
+from profiler import FrameProfiler
+
+def test_phase_run_twice_in_a_frame_counts_both():
+    profiler = FrameProfiler(("step", "draw"), capacity=4)
+    profiler.begin()
+    for step in range(2):
+        time.sleep(0.01)
+        profiler.lap("step")
+    profiler.lap("draw")
+    profiler.end()
+    profiler.close()
+
+    assert profiler.timings["step"][0] >= 0.02
+    assert profiler.timings["step"][0] + profiler.timings["draw"][0] <= profiler.frame_times[0]